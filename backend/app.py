@@ -3,6 +3,8 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
 from routes import router, initialize_model
+from scheduler import scheduler
+from serving_config import load_serving_config, apply_serving_config
 
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
@@ -14,6 +16,8 @@ logger = logging.getLogger(__name__)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("Starting application initialization...")
+    serving_config = apply_serving_config(load_serving_config())
+    scheduler.batch_sizes["predict"] = int(serving_config["batch_size"])
     await initialize_model()
     logger.info("Model initialized successfully")
     yield
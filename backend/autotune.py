@@ -0,0 +1,208 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+import numpy as np
+import logging
+
+from serving_config import CONFIG_PATH, THREAD_ENV_VARS, effective_cpu_count, cgroup_cpu_quota
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_IMAGES = ["NORMAL2-IM-1442-0001.jpeg", "person100_bacteria_481.jpeg", "image.png"]
+
+# Each worker holds its own copy of the model, so more than a few rarely pays off on one host
+DEFAULT_MAX_WORKERS = 4
+
+# Rough cost of spawning workers and loading DenseNet for one combination, for the runtime estimate
+STARTUP_SECONDS = 10.0
+
+
+def candidate_pairs(cpus, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    Enumerate (torch_threads, workers) pairs that fit in ``cpus``.
+
+    Thread counts are powers of two plus ``cpus`` itself; pairs whose
+    threads x workers exceed the CPU budget are skipped to avoid oversubscription.
+    """
+    thread_options = sorted({t for t in (2 ** i for i in range(cpus.bit_length())) if t <= cpus} | {cpus})
+    max_workers = max_workers or cpus
+    pairs = []
+    for threads in thread_options:
+        for workers in range(1, max_workers + 1):
+            if threads * workers > cpus:
+                break
+            pairs.append((threads, workers))
+    return pairs
+
+
+def rank_results(results, max_p99_ms=None):
+    """
+    Order results best first: highest throughput under the p99 latency budget,
+    then the ones over budget by lowest p99.
+    """
+    eligible = [r for r in results if max_p99_ms is None or r["p99_ms"] <= max_p99_ms]
+    over_budget = [r for r in results if r not in eligible]
+    return (sorted(eligible, key=lambda r: (-r["throughput"], r["p99_ms"]))
+            + sorted(over_budget, key=lambda r: r["p99_ms"]))
+
+
+def pick_best(results, max_p99_ms=None):
+    """
+    Pick the highest-throughput result, optionally under a p99 latency budget.
+
+    Falls back to the lowest p99 if nothing meets the budget.
+    """
+    return rank_results(results, max_p99_ms)[0]
+
+
+def estimated_runs(cpus, batch_sizes, max_workers=DEFAULT_MAX_WORKERS, top_pairs=3):
+    """Number of combinations the two-stage search benchmarks."""
+    pairs = len(candidate_pairs(cpus, max_workers))
+    return pairs + min(top_pairs, pairs) * (len(set(batch_sizes)) - 1)
+
+
+def _benchmark_worker(threads, batch_size, duration, warmup, image_paths, barrier, results):
+    """Load the real model in a fresh process and time preprocessing + forward on batches."""
+    # Must happen before torch/cv2 are imported so their native pools pick it up
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(threads)
+
+    import torch
+    import cv2
+    from models.xray_model import load_model, get_preprocess
+    from models.inference import load_image_tensor, predict_batch
+
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+    cv2.setNumThreads(1)
+
+    model, labels = load_model("cpu")
+    preprocess = get_preprocess()
+    images = []
+    for path in image_paths:
+        with open(path, "rb") as f:
+            images.append(f.read())
+
+    def run_batch(step):
+        batch = [load_image_tensor(images[(step + i) % len(images)], preprocess) for i in range(batch_size)]
+        predict_batch([t for t, _ in batch], [s for _, s in batch], model, labels, device="cpu")
+
+    for step in range(warmup):
+        run_batch(step)
+
+    # Start timing in every worker at the same moment so they contend like real workers
+    barrier.wait()
+    latencies = []
+    started = time.perf_counter()
+    step = 0
+    while time.perf_counter() - started < duration:
+        batch_started = time.perf_counter()
+        run_batch(step)
+        latencies.append((time.perf_counter() - batch_started) * 1000)
+        step += 1
+    results.put({"latencies_ms": latencies, "images": step * batch_size, "elapsed": time.perf_counter() - started})
+
+
+def benchmark_config(threads, workers, batch_size, duration, warmup, image_paths):
+    """
+    Benchmark one combination with ``workers`` concurrent processes.
+
+    Returns:
+        dict: throughput (images/s across workers) and batch latency percentiles
+    """
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+    processes = [
+        ctx.Process(target=_benchmark_worker, args=(threads, batch_size, duration, warmup, image_paths, barrier, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    worker_results = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    # A request waits for its whole batch, so batch latency is the per-request latency
+    latencies = np.concatenate([r["latencies_ms"] for r in worker_results])
+    elapsed = max(r["elapsed"] for r in worker_results)
+    return {
+        "torch_threads": threads,
+        "workers": workers,
+        "batch_size": batch_size,
+        "throughput": sum(r["images"] for r in worker_results) / elapsed,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark thread/worker/batch settings and write the serving config.")
+    parser.add_argument("--output", default=CONFIG_PATH, help="Where to write the serving config")
+    parser.add_argument("--images", nargs="+", default=SAMPLE_IMAGES)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--max-workers", type=int, default=DEFAULT_MAX_WORKERS,
+                        help="Largest worker count to try (0 = up to the CPU count; slow on big hosts)")
+    parser.add_argument("--top-pairs", type=int, default=3,
+                        help="Thread/worker pairs from the first stage whose batch sizes are tried")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds to benchmark each combination")
+    parser.add_argument("--warmup", type=int, default=3, help="Warmup batches per worker")
+    parser.add_argument("--max-p99-ms", type=float, default=None, help="Only pick configs whose p99 latency is under this")
+    args = parser.parse_args(argv)
+
+    image_paths = [p for p in args.images if os.path.exists(p)]
+    if not image_paths:
+        print("No benchmark images found.")
+        return 1
+
+    cpus = effective_cpu_count()
+    batch_sizes = sorted(set(args.batch_sizes))
+    pairs = candidate_pairs(cpus, args.max_workers)
+    runs = estimated_runs(cpus, batch_sizes, args.max_workers, args.top_pairs)
+    print(f"Effective CPUs: {cpus} (cpu_count={os.cpu_count()}, cgroup quota={cgroup_cpu_quota()})")
+    print(f"Benchmarking {runs} combinations, {args.duration:.0f}s each "
+          f"(~{runs * (args.duration + STARTUP_SECONDS) / 60:.0f} min including worker startup)\n")
+    print(f"{'threads':>7} {'workers':>7} {'batch':>5} {'img/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+
+    def run(threads, workers, batch_size):
+        result = benchmark_config(threads, workers, batch_size, args.duration, args.warmup, image_paths)
+        print(f"{threads:>7} {workers:>7} {batch_size:>5} {result['throughput']:>8.2f} {result['p50_ms']:>8.1f} {result['p99_ms']:>8.1f}")
+        return result
+
+    # Stage 1: every thread/worker pair at the smallest batch size
+    results = [run(threads, workers, batch_sizes[0]) for threads, workers in pairs]
+
+    # Stage 2: the remaining batch sizes only for the best few pairs
+    for top in rank_results(results, args.max_p99_ms)[:args.top_pairs]:
+        for batch_size in batch_sizes[1:]:
+            results.append(run(top["torch_threads"], top["workers"], batch_size))
+
+    best = pick_best(results, args.max_p99_ms)
+    config = {
+        "torch_threads": best["torch_threads"],
+        "interop_threads": 1,
+        "opencv_threads": 1,
+        "workers": best["workers"],
+        "batch_size": best["batch_size"],
+        "tuned_for": {
+            "effective_cpus": cpus,
+            "cpu_count": os.cpu_count(),
+            "cgroup_cpu_quota": cgroup_cpu_quota(),
+            "max_p99_ms": args.max_p99_ms,
+        },
+        "benchmark": best,
+    }
+    with open(args.output, "w") as f:
+        json.dump(config, f, indent=2)
+
+    print(f"\nBest: threads={best['torch_threads']} workers={best['workers']} batch={best['batch_size']} "
+          f"({best['throughput']:.2f} img/s, p99 {best['p99_ms']:.1f} ms)")
+    print(f"Serving config written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
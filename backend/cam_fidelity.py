@@ -0,0 +1,130 @@
+import argparse
+import sys
+import time
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_IMAGES = ["NORMAL2-IM-1442-0001.jpeg", "person100_bacteria_481.jpeg", "image.png"]
+
+
+def cam_similarity(cam_a, cam_b, top_fraction=0.2):
+    """
+    Compare two heatmaps of the same shape.
+
+    Args:
+        cam_a: First heatmap (e.g. Grad-CAM), values in [0, 1]
+        cam_b: Second heatmap (e.g. fast CAM), values in [0, 1]
+        top_fraction: Fraction of hottest pixels used for the overlap score
+
+    Returns:
+        dict: Pearson correlation, IoU of the hottest regions and mean absolute difference
+    """
+    a = np.asarray(cam_a, dtype=np.float64).ravel()
+    b = np.asarray(cam_b, dtype=np.float64).ravel()
+
+    if a.std() == 0 or b.std() == 0:
+        pearson = 1.0 if np.allclose(a, b) else 0.0
+    else:
+        pearson = float(np.corrcoef(a, b)[0, 1])
+
+    k = max(1, int(round(a.size * top_fraction)))
+    top_a = set(np.argpartition(a, -k)[-k:].tolist())
+    top_b = set(np.argpartition(b, -k)[-k:].tolist())
+    top_iou = len(top_a & top_b) / len(top_a | top_b)
+
+    return {
+        "pearson": pearson,
+        "top_iou": top_iou,
+        "mean_abs_diff": float(np.abs(a - b).mean()),
+    }
+
+
+def compare_image(image_bytes, model, labels, target_layer, device, top_k=3):
+    """
+    Run Grad-CAM and fast CAM on the top-k predicted classes of one image.
+
+    Returns:
+        list: One row per class with similarity metrics and timings
+    """
+    import io
+    from PIL import Image
+    from pytorch_grad_cam import GradCAM
+    from pytorch_grad_cam.utils.model_targets import ClassifierOutputTarget
+    from models.explain import compute_fast_cams
+    from models.xray_model import get_preprocess
+
+    pil_img = Image.open(io.BytesIO(image_bytes)).convert("L")
+    tensor_img = get_preprocess()(pil_img).to(device)
+
+    started = time.perf_counter()
+    fast_cams, probs = compute_fast_cams(model, tensor_img)
+    fast_seconds = time.perf_counter() - started
+
+    top_classes = [int(i) for i in np.argsort(probs)[::-1][:top_k]]
+    rows = []
+    with GradCAM(model=model, target_layers=[target_layer]) as cam:
+        for class_idx in top_classes:
+            started = time.perf_counter()
+            grad_cam = cam(input_tensor=tensor_img, targets=[ClassifierOutputTarget(class_idx)])[0]
+            gradcam_seconds = time.perf_counter() - started
+
+            row = cam_similarity(grad_cam, fast_cams[class_idx])
+            row.update({
+                "label": labels[class_idx],
+                "probability": float(probs[class_idx]),
+                "gradcam_ms": gradcam_seconds * 1000,
+                # fast CAM maps every class in one pass; report that pass per image
+                "fast_ms": fast_seconds * 1000,
+            })
+            rows.append(row)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare fast CAM against Grad-CAM on sample images.")
+    parser.add_argument("--images", nargs="+", default=SAMPLE_IMAGES)
+    parser.add_argument("--top-k", type=int, default=3, help="Number of top predicted classes to compare per image")
+    parser.add_argument("--min-pearson", type=float, default=None, help="Fail if mean correlation drops below this")
+    args = parser.parse_args(argv)
+
+    from models.xray_model import get_device, load_model, get_last_conv_layer
+
+    device = get_device()
+    model, labels = load_model(device)
+    target_layer = get_last_conv_layer(model)
+
+    all_rows = []
+    print(f"{'image':<32} {'label':<28} {'prob':>6} {'pearson':>8} {'top20 IoU':>10} {'MAD':>6} {'gradcam ms':>11} {'fast ms':>8}")
+    for path in args.images:
+        try:
+            with open(path, "rb") as f:
+                image_bytes = f.read()
+        except FileNotFoundError:
+            print(f"Skipping missing image: {path}")
+            continue
+
+        for row in compare_image(image_bytes, model, labels, target_layer, device, top_k=args.top_k):
+            all_rows.append(row)
+            print(
+                f"{path[:32]:<32} {row['label'][:28]:<28} {row['probability']:>6.3f} {row['pearson']:>8.3f} "
+                f"{row['top_iou']:>10.3f} {row['mean_abs_diff']:>6.3f} {row['gradcam_ms']:>11.1f} {row['fast_ms']:>8.1f}"
+            )
+
+    if not all_rows:
+        print("No images compared.")
+        return 1
+
+    mean_pearson = float(np.mean([r["pearson"] for r in all_rows]))
+    mean_iou = float(np.mean([r["top_iou"] for r in all_rows]))
+    print(f"\nMean pearson: {mean_pearson:.3f}  Mean top-20% IoU: {mean_iou:.3f}")
+
+    if args.min_pearson is not None and mean_pearson < args.min_pearson:
+        print(f"FAILED: mean pearson {mean_pearson:.3f} < {args.min_pearson}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,10 @@
 from models.inference import get_device,get_preprocess
 from pytorch_grad_cam import GradCAM
 from pytorch_grad_cam.utils.model_targets import ClassifierOutputTarget
-from pytorch_grad_cam.utils.image import show_cam_on_image
+from pytorch_grad_cam.utils.image import show_cam_on_image, scale_cam_image
 from PIL import Image
 import torchvision.transforms as T
+import torch
 import cv2
 import io
 import numpy as np
@@ -11,6 +12,9 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Longest side of the low-resolution overlay streamed before the full one
+PREVIEW_MAX_SIDE = 256
+
 def generate_heatmap(image_bytes, model, target_layer, pred_class_idx, device=None, original_size=None):
     """
     Generate Grad-CAM heatmap for the given image and prediction class.
@@ -44,45 +48,233 @@ def generate_heatmap(image_bytes, model, target_layer, pred_class_idx, device=No
         preprocess = get_preprocess()
         tensor_img = preprocess(original_pil).to(device)
         
-        # Set up Grad-CAM
-        cam = GradCAM(
-            model=model,
-            target_layers=[target_layer],
-        )
+        grayscale_cam = compute_gradcam(model, target_layer, tensor_img, pred_class_idx)  # Shape: (224, 224)
         
-        # Generate heatmap for specific class
-        targets = [ClassifierOutputTarget(pred_class_idx)]
-        grayscale_cam = cam(input_tensor=tensor_img, targets=targets)[0]  # Shape: (224, 224)
+        overlay_pil, heatmap_resized = render_overlay(original_pil, grayscale_cam, original_size)
         
-        # Resize heatmap to original image size
-        heatmap_resized = cv2.resize(grayscale_cam, original_size, interpolation=cv2.INTER_CUBIC)
+        logger.info("heatmap generated and saved")
         
-        # Prepare original image for overlay (resize to match heatmap and convert to RGB)
-        original_resized = original_pil.resize(original_size, Image.LANCZOS)
-        rgb_img = np.array(original_resized.convert("RGB")).astype(np.float32) / 255.0
+        return {
+            "heatmap_overlay": overlay_pil,
+            "heatmap_array": heatmap_resized,
+            "original_size": original_size,
+            "model_input_size": (224, 224),
+            "success": True,
+            "error": None
+        }
         
-        logger.info("creating heatmap overlay")
-        # Create heatmap overlay
-        heatmap_overlay = show_cam_on_image(rgb_img, heatmap_resized, use_rgb=True)
+    except Exception as e:
+        return {
+            "heatmap_overlay": None,
+            "heatmap_array": None,
+            "original_size": original_size,
+            "model_input_size": (224, 224),
+            "success": False,
+            "error": str(e)
+        }
+
+
+def compute_gradcam(model, target_layer, tensor_img, class_idx):
+    """Run Grad-CAM for one class and return the 224x224 map scaled to [0, 1]."""
+    # Set up Grad-CAM
+    cam = GradCAM(
+        model=model,
+        target_layers=[target_layer],
+    )
+    
+    # Generate heatmap for specific class
+    targets = [ClassifierOutputTarget(class_idx)]
+    return cam(input_tensor=tensor_img, targets=targets)[0]
+
+
+def preview_size(original_size, max_side=PREVIEW_MAX_SIDE):
+    """Scale (width, height) down so the longest side is at most ``max_side``."""
+    width, height = original_size
+    scale = min(1.0, max_side / max(width, height))
+    return (max(1, round(width * scale)), max(1, round(height * scale)))
+
+
+def compute_heatmap_cam(image_bytes, model, target_layer, pred_class_idx=None, device=None, mode="gradcam"):
+    """
+    Compute the 224x224 CAM for one class, keeping what's needed to render overlays later.
+    
+    In fast mode the single forward pass also yields the probabilities, so callers can
+    get predictions from this result instead of running ``predict`` separately.
+    
+    Args:
+        image_bytes: Raw image bytes
+        model: Loaded PyTorch model
+        target_layer: Target layer for Grad-CAM (unused in fast mode)
+        pred_class_idx: Index of the class to visualize. Required for Grad-CAM; in fast
+            mode None picks the top prediction.
+        device: Device to run on
+        mode: "gradcam" or "fast"
+    
+    Returns:
+        dict: cam (224x224 array), class_index, probabilities (fast mode only) and
+              original_pil for ``render_overlay``, plus size metadata
+    """
+    device = device or get_device()
+    original_size = None
+    
+    try:
+        original_pil = Image.open(io.BytesIO(image_bytes))
+        if original_pil.mode != 'L':
+            original_pil = original_pil.convert('L')
+        original_size = original_pil.size  # (width, height)
         
-        # Convert to PIL Image
-        overlay_pil = Image.fromarray(heatmap_overlay)
+        preprocess = get_preprocess()
+        tensor_img = preprocess(original_pil).to(device)
         
-        logger.info("heatmap generated and saved")
+        probs = None
+        if mode == "fast":
+            cams, probs = compute_fast_cams(model, tensor_img)
+            if pred_class_idx is None:
+                pred_class_idx = int(np.argsort(probs)[::-1][0])  # same tie-break as predict
+            grayscale_cam = cams[pred_class_idx]
+        else:
+            grayscale_cam = compute_gradcam(model, target_layer, tensor_img, pred_class_idx)
+        
+        return {
+            "cam": grayscale_cam,
+            "class_index": pred_class_idx,
+            "probabilities": probs,
+            "original_pil": original_pil,
+            "original_size": original_size,
+            "model_input_size": (224, 224),
+            "success": True,
+            "error": None
+        }
+    
+    except Exception as e:
+        return {
+            "cam": None,
+            "class_index": pred_class_idx,
+            "probabilities": None,
+            "original_pil": None,
+            "original_size": original_size,
+            "model_input_size": (224, 224),
+            "success": False,
+            "error": str(e)
+        }
+
+
+def render_overlay(original_pil, grayscale_cam, original_size):
+    """
+    Resize a 224x224 CAM to the original image size and overlay it on the image.
+    
+    Returns:
+        tuple: (overlay PIL Image, resized heatmap numpy array)
+    """
+    # Resize heatmap to original image size
+    heatmap_resized = cv2.resize(grayscale_cam, original_size, interpolation=cv2.INTER_CUBIC)
+    
+    # Prepare original image for overlay (resize to match heatmap and convert to RGB)
+    original_resized = original_pil.resize(original_size, Image.LANCZOS)
+    rgb_img = np.array(original_resized.convert("RGB")).astype(np.float32) / 255.0
+    
+    logger.info("creating heatmap overlay")
+    # Create heatmap overlay
+    heatmap_overlay = show_cam_on_image(rgb_img, heatmap_resized, use_rgb=True)
+    
+    # Convert to PIL Image
+    return Image.fromarray(heatmap_overlay), heatmap_resized
+
+
+def compute_fast_cams(model, tensor_img, class_indices=None):
+    """
+    Compute classic CAM (Zhou et al.) for one or more classes in a single forward pass.
+    
+    The torchxrayvision DenseNet ends in ReLU -> global average pooling -> linear
+    classifier, so the class score is a weighted sum of the final feature maps and
+    the map ``sum_k w_ck * A_k`` localizes it without any backward pass.
+    
+    Args:
+        model: Loaded torchxrayvision DenseNet (needs ``features`` and ``classifier``)
+        tensor_img: Preprocessed input tensor of shape [1, 1, 224, 224]
+        class_indices: Class indices to map. If None, maps every pathology.
+    
+    Returns:
+        tuple: (cams numpy array [len(class_indices), 224, 224] scaled to [0, 1],
+                probabilities numpy array [num_classes], same as ``predict``)
+    """
+    captured = {}
+    handle = model.features.register_forward_hook(lambda module, inputs, output: captured.update(features=output))
+    try:
+        with torch.no_grad():
+            outputs = model(tensor_img)
+    finally:
+        handle.remove()
+    
+    probs = torch.sigmoid(outputs).cpu().numpy()[0]
+    
+    weights = model.classifier.weight.detach()
+    if class_indices is None:
+        class_indices = list(range(weights.shape[0]))
+    
+    # The model applies ReLU before pooling, so apply it to the captured maps as well
+    feature_maps = torch.relu(captured["features"][0])  # [K, 7, 7]
+    cams = torch.einsum("ck,khw->chw", weights[class_indices], feature_maps)
+    cams = np.maximum(cams.cpu().numpy(), 0)
+    
+    # Same min-max scaling and resize Grad-CAM uses, so the two are comparable
+    height, width = tensor_img.shape[-2:]
+    return scale_cam_image(cams, (width, height)), probs
+
+
+def generate_fast_heatmap(image_bytes, model, pred_class_idx=None, device=None, original_size=None):
+    """
+    Generate a backward-free CAM heatmap, at roughly the cost of ``predict``.
+    
+    Args:
+        image_bytes: Raw image bytes
+        model: Loaded PyTorch model
+        pred_class_idx: Index of the class to visualize. If None, uses the top prediction.
+        device: Device to run on
+        original_size: Tuple (width, height) for output heatmap size. If None, uses original image size.
+    
+    Returns:
+        dict: Same keys as ``generate_heatmap`` plus the explained class index and probabilities
+    """
+    device = device or get_device()
+    
+    try:
+        logger.info("generating fast CAM heatmap")
+        original_pil = Image.open(io.BytesIO(image_bytes))
+        if original_pil.mode != 'L':
+            original_pil = original_pil.convert('L')
+        
+        if original_size is None:
+            original_size = original_pil.size  # (width, height)
+        
+        preprocess = get_preprocess()
+        tensor_img = preprocess(original_pil).to(device)
+        
+        # One forward pass gives both the probabilities and the feature maps,
+        # so the top class can be picked without calling predict first
+        cams, probs = compute_fast_cams(model, tensor_img)
+        if pred_class_idx is None:
+            pred_class_idx = int(np.argsort(probs)[::-1][0])  # same tie-break as predict
+        
+        overlay_pil, heatmap_resized = render_overlay(original_pil, cams[pred_class_idx], original_size)
         
         return {
             "heatmap_overlay": overlay_pil,
             "heatmap_array": heatmap_resized,
+            "class_index": pred_class_idx,
+            "probabilities": probs,
             "original_size": original_size,
             "model_input_size": (224, 224),
             "success": True,
             "error": None
         }
-        
+    
     except Exception as e:
         return {
             "heatmap_overlay": None,
             "heatmap_array": None,
+            "class_index": pred_class_idx,
+            "probabilities": None,
             "original_size": original_size,
             "model_input_size": (224, 224),
             "success": False,
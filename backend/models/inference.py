@@ -4,7 +4,7 @@ import torch
 import numpy as np
 from PIL import Image
 import torchxrayvision as xrv
-from models.xray_model import get_device,load_model,get_preprocess,get_last_conv_layer
+from models.xray_model import get_device,load_model,get_preprocess,get_last_conv_layer,array_to_tensor
 from skimage import exposure
 import logging
 
@@ -31,31 +31,99 @@ def predict(image_bytes, model, labels, preprocess, target_layer, device=None):
     logger.info("preprocessing image")
     
     # Step 1: Load and preprocess image
+    tensor_img, original_size = load_image_tensor(image_bytes, preprocess)
+    
+    return _run_model(tensor_img.to(device), original_size, model, labels)
+
+
+def load_image_tensor(image_bytes, preprocess):
+    """Decode image bytes and preprocess them, returning (tensor, (width, height))."""
     pil_img = Image.open(io.BytesIO(image_bytes))
     original_size = pil_img.size  # (width, height)
-    tensor_img = preprocess(pil_img).to(device)
+    return preprocess(pil_img), original_size
+
+
+def load_array_tensor(pixels, original_size):
+    """Normalize a reduced 224x224 upload, returning (tensor, (width, height))."""
+    return array_to_tensor(pixels), tuple(original_size)
+
+
+def predict_array(pixels, original_size, model, labels, device=None):
+    """
+    Predict disease probabilities from an already reduced 224x224 grayscale array.
+    
+    Skips image decoding and resizing entirely; the array goes straight to normalization.
+    
+    Args:
+        pixels: uint8 numpy array of shape (224, 224)
+        original_size: Tuple (width, height) of the image before the client reduced it
+        model: Loaded PyTorch model
+        labels: List of disease labels
+        device: Device to run on
+    
+    Returns:
+        dict: Predictions and metadata
+    """
+    logger.info("predicting diseases based on reduced xray upload")
+    device = device or get_device()
+    tensor_img, original_size = load_array_tensor(pixels, original_size)
+    return _run_model(tensor_img.to(device), original_size, model, labels)
+
+
+def predict_batch(tensors, original_sizes, model, labels, device=None):
+    """
+    Predict disease probabilities for several preprocessed images in one forward pass.
+    
+    Args:
+        tensors: List of preprocessed tensors, each [1, 1, 224, 224]
+        original_sizes: List of (width, height) tuples, one per tensor
+        model: Loaded PyTorch model
+        labels: List of disease labels
+        device: Device to run on
     
+    Returns:
+        list: One predict-style result dict per input, in order
+    """
+    logger.info(f"predicting diseases for a batch of {len(tensors)} xrays")
+    device = device or get_device()
+    batch = torch.cat([t.to(device) for t in tensors], dim=0)
+    return _run_model_batch(batch, [tuple(size) for size in original_sizes], model, labels)
+
+
+def _run_model(tensor_img, original_size, model, labels):
+    """Run the model on a preprocessed tensor and sort the predictions."""
+    return _run_model_batch(tensor_img, [original_size], model, labels)[0]
+
+
+def _run_model_batch(tensor_batch, original_sizes, model, labels):
+    """Run the model on a batch of preprocessed tensors and sort each row's predictions."""
     logger.info("sending the processed image to model for processing")
 
     # Step 2: Inference
     with torch.no_grad():
-        outputs = model(tensor_img)
-        probs = torch.sigmoid(outputs).cpu().numpy()[0]
+        outputs = model(tensor_batch)
+        batch_probs = torch.sigmoid(outputs).cpu().numpy()
         
     logger.info("prediction generated by model")
 
+    results = [sort_predictions(probs, labels, original_size)
+               for probs, original_size in zip(batch_probs, original_sizes)]
+    logger.info("predictions sorted and sending results")
+
+    return results
+
+
+def sort_predictions(probs, labels, original_size):
+    """Build a predict-style result dict from one row of probabilities in label order."""
     # Sort predictions by probability (descending)
     sorted_indices = np.argsort(probs)[::-1]
     predictions = [{"label": labels[i], "prob": float(probs[i])}
                    for i in sorted_indices]
     
     top_idx = sorted_indices[0]
-    top_label = labels[top_idx]
-    logger.info("predictions sorted and sending results")
-
     return {
         "predictions": predictions,
-        "top_label": top_label,
+        "top_label": labels[top_idx],
         "top_probability": float(probs[top_idx]),
         "top_class_index": int(top_idx),
         "original_size": original_size,
@@ -4,6 +4,8 @@ import torchxrayvision as xrv
 import torch
 from skimage import exposure
 
+MODEL_INPUT_SIZE = 224
+
 def get_device():
     if torch.cuda.is_available():
         return "cuda"
@@ -31,6 +33,15 @@ def normalize_xray(img):
 
 
 
+def array_to_tensor(np_img):
+    """Normalize a 224x224 grayscale array and convert it to a model input tensor."""
+    np_img = normalize_xray(np_img)
+    
+    # Convert to tensor and add batch dimension
+    tensor = torch.from_numpy(np_img).unsqueeze(0).unsqueeze(0)  # [1, 1, 224, 224]
+    return tensor.float()
+
+
 def get_preprocess():
     """Custom preprocessing for torchxrayvision models."""
     def preprocess_fn(pil_image):
@@ -39,15 +50,10 @@ def get_preprocess():
             pil_image = pil_image.convert('L')
         
         # Resize to 224x224
-        pil_image = pil_image.resize((224, 224), Image.LANCZOS)
+        pil_image = pil_image.resize((MODEL_INPUT_SIZE, MODEL_INPUT_SIZE), Image.LANCZOS)
         
         # Convert to numpy and normalize for xray vision
-        np_img = np.array(pil_image)
-        np_img = normalize_xray(np_img)
-        
-        # Convert to tensor and add batch dimension
-        tensor = torch.from_numpy(np_img).unsqueeze(0).unsqueeze(0)  # [1, 1, 224, 224]
-        return tensor.float()
+        return array_to_tensor(np.array(pil_image))
     
     return preprocess_fn
 
@@ -0,0 +1,368 @@
+import argparse
+import copy
+import csv
+import io
+import os
+import sys
+import time
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LABELS_CSV = "parity_labels.csv"
+
+# Paths that change the numerics on purpose get looser defaults than --tolerance
+DEFAULT_PATH_TOLERANCES = {"reduced": 0.05, "quantized": 0.02, "compiled": 1e-3}
+
+
+class PathUnavailable(Exception):
+    """Raised by a path factory when its backend is not supported on this platform."""
+
+
+def load_labeled_images(labels_csv, image_dir=None):
+    """
+    Load a labeled image set from a CSV.
+
+    The CSV has a ``filename`` column plus one column per pathology holding 1, 0,
+    or blank when unknown. Filenames are resolved relative to ``image_dir``
+    (defaults to the CSV's directory).
+
+    Returns:
+        tuple: (filenames, list of image bytes, dict pathology -> list of 0/1/None)
+    """
+    image_dir = image_dir or os.path.dirname(os.path.abspath(labels_csv))
+    filenames, images = [], []
+    targets = {}
+    with open(labels_csv, newline="") as f:
+        reader = csv.DictReader(f)
+        pathologies = [c for c in reader.fieldnames if c != "filename"]
+        targets = {p: [] for p in pathologies}
+        for row in reader:
+            with open(os.path.join(image_dir, row["filename"]), "rb") as img:
+                images.append(img.read())
+            filenames.append(row["filename"])
+            for p in pathologies:
+                value = (row[p] or "").strip()
+                targets[p].append(int(float(value)) if value else None)
+    return filenames, images, targets
+
+
+def probs_from_predictions(predictions, labels):
+    """Turn predict()'s sorted prediction list back into a probability vector in label order."""
+    index = {label: i for i, label in enumerate(labels)}
+    probs = np.zeros(len(labels), dtype=np.float64)
+    for pred in predictions:
+        probs[index[pred["label"]]] = pred["prob"]
+    return probs
+
+
+def reference_path(model, labels, preprocess, target_layer, device, batch_size):
+    """Today's ``predict()``, one image at a time."""
+    from models.inference import predict
+
+    def run(images):
+        return np.stack([
+            probs_from_predictions(
+                predict(image_bytes=b, model=model, labels=labels, preprocess=preprocess, target_layer=target_layer, device=device)["predictions"],
+                labels,
+            )
+            for b in images
+        ])
+    return run
+
+
+def _batched_run(model, labels, preprocess, device, batch_size):
+    from models.inference import load_image_tensor, predict_batch
+
+    def run(images):
+        rows = []
+        for start in range(0, len(images), batch_size):
+            loaded = [load_image_tensor(b, preprocess) for b in images[start:start + batch_size]]
+            results = predict_batch([t for t, _ in loaded], [s for _, s in loaded], model, labels, device)
+            rows.extend(probs_from_predictions(r["predictions"], labels) for r in results)
+        return np.stack(rows)
+    return run
+
+
+def batched_path(model, labels, preprocess, target_layer, device, batch_size):
+    """Micro-batched ``predict_batch`` as used by the predict lane."""
+    return _batched_run(model, labels, preprocess, device, batch_size)
+
+
+def client_reduce(pil_image):
+    """
+    Reduce an image the way the frontend's ``reduceImage`` does.
+
+    The canvas resamples RGB first and the luma is computed afterwards with integer
+    weights and round-half-up. Browsers' "high" smoothing kernel is unspecified, so
+    PIL's bilinear stands in for it.
+    """
+    from PIL import Image
+
+    rgb = np.array(pil_image.convert("RGB").resize((224, 224), Image.BILINEAR)).astype(np.int64)
+    luma = (rgb[..., 0] * 299 + rgb[..., 1] * 587 + rgb[..., 2] * 114 + 500) // 1000
+    return luma.astype(np.uint8)
+
+
+def reduced_path(model, labels, preprocess, target_layer, device, batch_size):
+    """Reduced uploads: the browser's 224x224 reduction (``client_reduce``) into ``predict_array``."""
+    from PIL import Image
+    from models.inference import predict_array
+
+    def run(images):
+        rows = []
+        for b in images:
+            pil = Image.open(io.BytesIO(b))
+            original_size = pil.size
+            pixels = client_reduce(pil)
+            result = predict_array(pixels=pixels, original_size=original_size, model=model, labels=labels, device=device)
+            rows.append(probs_from_predictions(result["predictions"], labels))
+        return np.stack(rows)
+    return run
+
+
+def fast_cam_path(model, labels, preprocess, target_layer, device, batch_size):
+    """Probabilities from the fast CAM forward pass (explain?mode=fast)."""
+    from PIL import Image
+    from models.explain import compute_fast_cams
+
+    def run(images):
+        rows = []
+        for b in images:
+            tensor_img = preprocess(Image.open(io.BytesIO(b))).to(device)
+            _, probs = compute_fast_cams(model, tensor_img, class_indices=[0])
+            rows.append(probs)
+        return np.stack(rows)
+    return run
+
+
+def quantized_path(model, labels, preprocess, target_layer, device, batch_size):
+    """Dynamic int8 quantization of the linear classifier (CPU only)."""
+    import torch
+
+    if torch.backends.quantized.engine == "none":
+        raise PathUnavailable(f"no quantized engine (supported: {torch.backends.quantized.supported_engines})")
+    quantized = torch.ao.quantization.quantize_dynamic(copy.deepcopy(model).cpu(), {torch.nn.Linear}, dtype=torch.qint8)
+    return _batched_run(quantized, labels, preprocess, "cpu", batch_size)
+
+
+def compiled_path(model, labels, preprocess, target_layer, device, batch_size):
+    """``torch.compile`` of the model, compiled up front so timing excludes it."""
+    import torch
+    import torch._dynamo
+
+    if not torch._dynamo.is_dynamo_supported():
+        raise PathUnavailable("torch.compile is not supported on this Python/platform")
+    # Dynamic batch dimension, so a short last batch does not trigger a recompile
+    compiled = torch.compile(model, dynamic=True)
+    try:
+        with torch.no_grad():
+            compiled(torch.zeros(2, 1, 224, 224, device=device))
+    except torch._dynamo.exc.BackendCompilerFailed as e:
+        # Compiler toolchain missing (no C++ compiler for inductor, no triton for GPU)
+        raise PathUnavailable(f"compile backend failed: {e}") from e
+    return _batched_run(compiled, labels, preprocess, device, batch_size)
+
+
+# Each factory returns run(list of image bytes) -> probabilities [N, C] in label order
+PATHS = {
+    "batched": batched_path,
+    "reduced": reduced_path,
+    "fast_cam": fast_cam_path,
+    "quantized": quantized_path,
+    "compiled": compiled_path,
+}
+
+
+def compare_to_reference(ref_probs, probs, top_k=3):
+    """
+    Compare a path's probabilities against the reference.
+
+    Args:
+        ref_probs: Reference probabilities [N, C]
+        probs: Candidate probabilities [N, C]
+        top_k: Size of the top-k set to compare
+
+    Returns:
+        dict: per-pathology max |delta p|, overall max delta, top-1 agreement and
+              top-k set agreement (fraction of images with identical sets)
+    """
+    ref_probs = np.asarray(ref_probs, dtype=np.float64)
+    probs = np.asarray(probs, dtype=np.float64)
+    per_label_delta = np.abs(probs - ref_probs).max(axis=0)
+
+    ref_order = np.argsort(-ref_probs, axis=1, kind="stable")
+    order = np.argsort(-probs, axis=1, kind="stable")
+    top1 = float(np.mean(ref_order[:, 0] == order[:, 0]))
+    topk = float(np.mean([set(r[:top_k]) == set(o[:top_k]) for r, o in zip(ref_order, order)]))
+
+    return {
+        "per_label_max_delta": per_label_delta,
+        "max_delta": float(per_label_delta.max()),
+        "top1_agreement": top1,
+        "topk_agreement": topk,
+    }
+
+
+def label_aurocs(probs, targets, labels):
+    """
+    Per-label AUROC for every pathology in ``targets`` the model also predicts.
+
+    Labels with unknown targets are skipped per image; labels without both
+    classes present are reported as None.
+    """
+    from sklearn.metrics import roc_auc_score
+
+    index = {label: i for i, label in enumerate(labels)}
+    aurocs = {}
+    for pathology, values in targets.items():
+        if pathology not in index:
+            continue
+        known = [(i, v) for i, v in enumerate(values) if v is not None]
+        y_true = [v for _, v in known]
+        if len(set(y_true)) < 2:
+            aurocs[pathology] = None
+            continue
+        y_score = [probs[i, index[pathology]] for i, _ in known]
+        aurocs[pathology] = float(roc_auc_score(y_true, y_score))
+    return aurocs
+
+
+def check_gate(report, ref_aurocs, tolerance, min_topk_agreement, max_auroc_drop):
+    """
+    Check one path's report against the tolerance gate.
+
+    Returns:
+        list: Failure messages (empty if the path passes)
+    """
+    failures = []
+    if report["max_delta"] > tolerance:
+        failures.append(f"max probability delta {report['max_delta']:.4f} > {tolerance}")
+    if report["topk_agreement"] < min_topk_agreement:
+        failures.append(f"top-k agreement {report['topk_agreement']:.3f} < {min_topk_agreement}")
+    for pathology, ref_auc in ref_aurocs.items():
+        auc = report["aurocs"].get(pathology)
+        if ref_auc is not None and auc is not None and ref_auc - auc > max_auroc_drop:
+            failures.append(f"{pathology} AUROC dropped {ref_auc - auc:.4f} > {max_auroc_drop}")
+    return failures
+
+
+def _parse_path_tolerances(values):
+    tolerances = dict(DEFAULT_PATH_TOLERANCES)
+    for value in values or []:
+        name, _, tol = value.partition("=")
+        tolerances[name] = float(tol)
+    return tolerances
+
+
+def _timed(run, images, repeats):
+    """Run a path ``repeats`` times and return (probs, best wall time)."""
+    best = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        probs = run(images)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return probs, best
+
+
+def run_paths(names, factory_args, images, repeats):
+    """
+    Build and time each path.
+
+    Only a factory raising ``PathUnavailable`` skips a path; any other error,
+    including one raised while running inference, is a crash.
+
+    Returns:
+        tuple: (dict name -> (probs, best seconds), list of (name, exception) crashes)
+    """
+    timings, crashed = {}, []
+    for name in names:
+        try:
+            run = PATHS[name](*factory_args)
+        except PathUnavailable as e:
+            print(f"Skipping {name}: unavailable on this platform: {e}")
+            continue
+        except Exception as e:
+            crashed.append((name, e))
+            continue
+        try:
+            timings[name] = _timed(run, images, repeats)
+        except Exception as e:
+            crashed.append((name, e))
+    return timings, crashed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check optimized inference paths against the reference predict().")
+    parser.add_argument("--labels-csv", default=DEFAULT_LABELS_CSV, help="CSV with filename + 0/1 pathology columns")
+    parser.add_argument("--image-dir", default=None, help="Directory holding the images (defaults to the CSV's)")
+    parser.add_argument("--paths", nargs="+", default=["batched", "reduced", "fast_cam", "quantized"], choices=list(PATHS))
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--repeats", type=int, default=2, help="Timing repeats per path (best is kept)")
+    parser.add_argument("--tolerance", type=float, default=1e-4, help="Max allowed |delta p| for any pathology")
+    parser.add_argument("--path-tolerance", action="append", metavar="PATH=TOL", help="Per-path override, e.g. reduced=0.1")
+    parser.add_argument("--min-topk-agreement", type=float, default=1.0)
+    parser.add_argument("--max-auroc-drop", type=float, default=0.01)
+    args = parser.parse_args(argv)
+
+    from models.xray_model import get_device, load_model, get_preprocess, get_last_conv_layer
+
+    filenames, images, targets = load_labeled_images(args.labels_csv, args.image_dir)
+    device = get_device()
+    model, labels = load_model(device)
+    preprocess = get_preprocess()
+    target_layer = get_last_conv_layer(model)
+    path_tolerances = _parse_path_tolerances(args.path_tolerance)
+
+    factory_args = (model, labels, preprocess, target_layer, device, args.batch_size)
+    ref_probs, ref_seconds = _timed(reference_path(*factory_args), images, args.repeats)
+    ref_aurocs = label_aurocs(ref_probs, targets, labels)
+    print(f"Reference predict(): {len(images)} images in {ref_seconds * 1000:.1f} ms")
+
+    reports = {}
+    timings, crashed = run_paths(args.paths, factory_args, images, args.repeats)
+    for name, (probs, seconds) in timings.items():
+        report = compare_to_reference(ref_probs, probs, args.top_k)
+        report["aurocs"] = label_aurocs(probs, targets, labels)
+        report["speedup"] = ref_seconds / seconds
+        reports[name] = report
+
+    print(f"\n{'path':<10} {'max |dp|':>9} {'top-1':>6} {f'top-{args.top_k}':>6} {'speedup':>8}")
+    for name, report in reports.items():
+        print(f"{name:<10} {report['max_delta']:>9.5f} {report['top1_agreement']:>6.2f} {report['topk_agreement']:>6.2f} {report['speedup']:>7.2f}x")
+
+    print(f"\n{'pathology':<28} {'ref AUROC':>9} " + " ".join(f"{n[:10]:>10}" for n in reports))
+    for i, label in enumerate(labels):
+        if not label:
+            continue
+        ref_auc = ref_aurocs.get(label)
+        cells = []
+        for report in reports.values():
+            auc = report["aurocs"].get(label)
+            auc_text = "-" if auc is None else f"{auc:.2f}"
+            cells.append(f"{report['per_label_max_delta'][i]:.4f}/{auc_text}")
+        ref_text = "-" if ref_auc is None else f"{ref_auc:.3f}"
+        print(f"{label[:28]:<28} {ref_text:>9} " + " ".join(f"{c:>10}" for c in cells))
+    print("(cells: max |dp| / AUROC)")
+
+    failed = bool(crashed)
+    for name, e in crashed:
+        print(f"FAIL {name}: crashed: {type(e).__name__}: {e}")
+    if not reports and not crashed:
+        print("FAIL: no path could be checked")
+        failed = True
+    for name, report in reports.items():
+        failures = check_gate(report, ref_aurocs, path_tolerances.get(name, args.tolerance), args.min_topk_agreement, args.max_auroc_drop)
+        for failure in failures:
+            print(f"FAIL {name}: {failure}")
+        failed = failed or bool(failures)
+
+    print("\nPARITY FAILED" if failed else "\nPARITY PASSED")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,15 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, UploadFile, File, Form, Query, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 import asyncio
-from typing import Dict, Any
+import json
+from functools import partial
+from typing import Dict, Any, Optional
 import logging
 
-from models.inference import predict
-from models.explain import generate_heatmap
+from models.inference import predict, predict_batch, load_image_tensor, load_array_tensor, sort_predictions
+from models.explain import generate_heatmap, generate_fast_heatmap, compute_heatmap_cam, preview_size, render_overlay
 from models.xray_model import get_device, get_last_conv_layer, get_preprocess,load_model
+from scheduler import scheduler, DeadlineExceeded, ClientDisconnected
 from utils import file_manager, image_to_base64, create_error_response, create_success_response
 
 logging.basicConfig(level=logging.INFO)
@@ -36,30 +39,85 @@ async def initialize_model():
         raise e
 
 
+def _raise_for_dropped_job(e: Exception):
+    """Translate scheduler drop reasons into HTTP errors."""
+    if isinstance(e, DeadlineExceeded):
+        raise HTTPException(status_code=504, detail=str(e))
+    # 499 = client closed request (nginx convention)
+    raise HTTPException(status_code=499, detail=str(e))
+
+
+def _predict_batch(loaders):
+    """
+    Scheduler batch function for the predict lane.
+    
+    Each item is a zero-argument loader returning (tensor, original_size). Inputs that
+    fail to load get their exception back instead of failing the whole batch.
+    """
+    prepared = []
+    for load in loaders:
+        try:
+            prepared.append(load())
+        except Exception as e:
+            prepared.append(e)
+    
+    loaded = [p for p in prepared if not isinstance(p, Exception)]
+    batch_results = iter(predict_batch([t for t, _ in loaded], [s for _, s in loaded], model, labels, device) if loaded else [])
+    return [p if isinstance(p, Exception) else next(batch_results) for p in prepared]
+
+
 @router.post("/predict")
-async def predict_disease(file: UploadFile = File(...)) -> JSONResponse:
+async def predict_disease(
+    request: Request,
+    file: Optional[UploadFile] = File(None),
+    pixels: Optional[UploadFile] = File(None),
+    width: Optional[int] = Form(None),
+    height: Optional[int] = Form(None),
+) -> JSONResponse:
     """
     Predict top-5 diseases from chest X-ray image.
     
+    Accepts either a full image in ``file`` or a reduced upload: ``pixels`` holding a
+    224x224 uint8 grayscale buffer plus the original ``width``/``height``, which skips
+    server-side decoding and resizing.
+    
     Args:
+        request: Incoming request (used for deadline header and disconnect detection)
         file: Uploaded chest X-ray image (PNG/JPG)
+        pixels: Pre-reduced 224x224 uint8 grayscale buffer
+        width: Original image width (reduced uploads only)
+        height: Original image height (reduced uploads only)
         
     Returns:
         JSON response with top-5 predictions and probabilities
     """
     file_path = None
+    deadline = scheduler.deadline_for("predict", request)
     
     try:
         if model is None:
             await initialize_model()
         
-        file_path, file_bytes = file_manager.save_uploaded_file(file)
-        logger.info(f"Processing prediction for file: {file.filename}")
+        if pixels is not None:
+            filename = pixels.filename
+            pixel_array = file_manager.read_reduced_upload(pixels, width, height)
+            logger.info(f"Processing reduced prediction for file: {filename}")
+            
+            loader = partial(load_array_tensor, pixel_array, (width, height))
+        elif file is not None:
+            filename = file.filename
+            file_path, file_bytes = file_manager.save_uploaded_file(file)
+            logger.info(f"Processing prediction for file: {filename}")
+            
+            loader = partial(load_image_tensor, file_bytes, preprocess)
+        else:
+            raise HTTPException(status_code=400, detail="Either file or pixels must be provided")
         
-        pred_results = predict(image_bytes=file_bytes,model=model,labels=labels,preprocess=preprocess,target_layer=target_layer,device=device)  
+        # Predicts queued behind each other share one forward pass (see serving config batch_size)
+        pred_results = await scheduler.run_batched("predict", _predict_batch, loader, deadline=deadline, request=request)
       
         response_data = {
-            "filename": file.filename,
+            "filename": filename,
             "predictions": pred_results["predictions"][:5], 
             "top_prediction": {
                 "label": pred_results["top_label"],
@@ -72,6 +130,9 @@ async def predict_disease(file: UploadFile = File(...)) -> JSONResponse:
             status_code=200
         )
         
+    except (DeadlineExceeded, ClientDisconnected) as e:
+        logger.warning(f"Predict request dropped: {e}")
+        _raise_for_dropped_job(e)
     except HTTPException as e:
         logger.error(f"HTTP error in predict: {e.detail}")
         raise e
@@ -87,42 +148,68 @@ async def predict_disease(file: UploadFile = File(...)) -> JSONResponse:
 
 
 @router.post("/explain")
-async def explain_prediction(file: UploadFile = File(...)) -> JSONResponse:
+async def explain_prediction(request: Request, file: UploadFile = File(...), mode: str = Query("gradcam")) -> JSONResponse:
     """
     Generate Grad-CAM heatmap explanation for chest X-ray image.
     
     Args:
+        request: Incoming request (used for deadline header and disconnect detection)
         file: Uploaded chest X-ray image (PNG/JPG)
+        mode: "gradcam" (default) or "fast" for backward-free CAM in a single forward pass
         
     Returns:
         JSON response with base64 encoded heatmap overlay
     """
     file_path = None
+    deadline = scheduler.deadline_for("explain", request)
     
     try:
+        if mode not in ("gradcam", "fast"):
+            raise HTTPException(status_code=400, detail="Invalid mode. Allowed: gradcam, fast")
+        
         if model is None:
             await initialize_model()
         
         file_path, file_bytes = file_manager.save_uploaded_file(file)
-        logger.info(f"Processing explanation for file: {file.filename}")
+        logger.info(f"Processing {mode} explanation for file: {file.filename}")
         
-        pred_results = predict(image_bytes=file_bytes,model=model,labels=labels,preprocess=preprocess,target_layer=target_layer,device=device)
-        
-        heatmap_results = generate_heatmap(image_bytes=file_bytes,model=model,target_layer=target_layer,pred_class_idx=pred_results["top_class_index"],device=device,original_size=pred_results["original_size"])   
-        
-        if not heatmap_results["success"]:
-            raise Exception(heatmap_results["error"])
+        if mode == "fast":
+            # Predictions and CAM come out of the same forward pass
+            heatmap_results = await scheduler.run("explain", generate_fast_heatmap, image_bytes=file_bytes,model=model,device=device, deadline=deadline, request=request)
+            
+            if not heatmap_results["success"]:
+                raise Exception(heatmap_results["error"])
+            
+            class_index = heatmap_results["class_index"]
+            explained_prediction = {
+                "label": labels[class_index],
+                "probability": float(heatmap_results["probabilities"][class_index]),
+                "class_index": class_index
+            }
+        else:
+            # One job with two stages: deadline/disconnect are re-checked before the expensive
+            # Grad-CAM pass without sending it to the back of the explain lane
+            pred_results, heatmap_results = await scheduler.run_stages("explain", [
+                partial(predict, image_bytes=file_bytes,model=model,labels=labels,preprocess=preprocess,target_layer=target_layer,device=device),
+                lambda pred: generate_heatmap(image_bytes=file_bytes,model=model,target_layer=target_layer,pred_class_idx=pred["top_class_index"],device=device,original_size=pred["original_size"]),
+            ], deadline=deadline, request=request)
+            
+            if not heatmap_results["success"]:
+                raise Exception(heatmap_results["error"])
+            
+            explained_prediction = {
+                "label": pred_results["top_label"],
+                "probability": pred_results["top_probability"],
+                "class_index": pred_results["top_class_index"]
+            }
         
         heatmap_base64 = image_to_base64(heatmap_results["heatmap_overlay"])
         
         response_data = {
             "filename": file.filename,
             "heatmap_image": heatmap_base64,
-            "explained_prediction": {
-                "label": pred_results["top_label"],
-                "probability": pred_results["top_probability"],
-                "class_index": pred_results["top_class_index"]
-            },
+            "explain_mode": mode,
+            "explained_prediction": explained_prediction,
             "image_info": {
                 "original_size": heatmap_results["original_size"],
                 "model_input_size": heatmap_results["model_input_size"]
@@ -133,6 +220,9 @@ async def explain_prediction(file: UploadFile = File(...)) -> JSONResponse:
             status_code=200
         )
         
+    except (DeadlineExceeded, ClientDisconnected) as e:
+        logger.warning(f"Explain request dropped: {e}")
+        _raise_for_dropped_job(e)
     except HTTPException as e:
         logger.error(f"HTTP error in explain: {e.detail}")
         raise e
@@ -148,6 +238,132 @@ async def explain_prediction(file: UploadFile = File(...)) -> JSONResponse:
             file_manager.cleanup_file(file_path)
 
 
+def _ndjson_event(event_type: str, payload: Dict[str, Any]) -> str:
+    """Serialize one streaming event as a newline-delimited JSON line."""
+    return json.dumps({"type": event_type, **payload}) + "\n"
+
+
+def _render_overlay_base64(cam_results: Dict[str, Any], size) -> str:
+    """Render an overlay of a CAM stage result at ``size`` and encode it."""
+    overlay_pil, _ = render_overlay(cam_results["original_pil"], cam_results["cam"], size)
+    return image_to_base64(overlay_pil)
+
+
+@router.post("/explain/stream")
+async def explain_prediction_stream(request: Request, file: UploadFile = File(...), mode: str = Query("gradcam")):
+    """
+    Progressive variant of /explain, streamed as NDJSON (one JSON object per line).
+    
+    Events, in order:
+        prediction: same data as /predict, sent as soon as the forward pass completes
+        preview: explain data with a low-resolution heatmap overlay
+        overlay: explain data with the full-size heatmap overlay (same as /explain)
+        error: sent instead of the remaining events if a stage fails
+    
+    Args:
+        request: Incoming request (used for deadline header and disconnect detection)
+        file: Uploaded chest X-ray image (PNG/JPG)
+        mode: "gradcam" (default) or "fast"
+        
+    Returns:
+        Streaming NDJSON response
+    """
+    file_path = None
+    predict_deadline = scheduler.deadline_for("predict", request)
+    deadline = scheduler.deadline_for("explain", request)
+    
+    try:
+        if mode not in ("gradcam", "fast"):
+            raise HTTPException(status_code=400, detail="Invalid mode. Allowed: gradcam, fast")
+        
+        if model is None:
+            await initialize_model()
+        
+        file_path, file_bytes = file_manager.save_uploaded_file(file)
+        logger.info(f"Streaming {mode} explanation for file: {file.filename}")
+    except HTTPException as e:
+        logger.error(f"HTTP error in explain stream: {e.detail}")
+        if file_path:
+            file_manager.cleanup_file(file_path)
+        raise e
+    except Exception as e:
+        logger.error(f"Unexpected error in explain stream: {e}")
+        if file_path:
+            file_manager.cleanup_file(file_path)
+        return JSONResponse(
+            content=create_error_response(f"Explanation failed: {str(e)}"),
+            status_code=500
+        )
+    
+    filename = file.filename
+    
+    async def event_stream():
+        try:
+            if mode == "fast":
+                # One forward pass gives both the probabilities and the CAM
+                cam_results = await scheduler.run("explain", compute_heatmap_cam, image_bytes=file_bytes,model=model,target_layer=target_layer,device=device,mode=mode, deadline=deadline, request=request)
+                if not cam_results["success"]:
+                    raise Exception(cam_results["error"])
+                pred_results = sort_predictions(cam_results["probabilities"], labels, cam_results["original_size"])
+            else:
+                # Same lane, batching and deadline as /predict so the first event is not stuck behind queued explains
+                pred_results = await scheduler.run_batched("predict", _predict_batch, partial(load_image_tensor, file_bytes, preprocess), deadline=predict_deadline, request=request)
+            
+            yield _ndjson_event("prediction", {"data": {
+                "filename": filename,
+                "predictions": pred_results["predictions"][:5],
+                "top_prediction": {
+                    "label": pred_results["top_label"],
+                    "probability": pred_results["top_probability"]
+                }
+            }})
+            
+            if mode != "fast":
+                cam_results = await scheduler.run("explain", compute_heatmap_cam, image_bytes=file_bytes,model=model,target_layer=target_layer,pred_class_idx=pred_results["top_class_index"],device=device,mode=mode, deadline=deadline, request=request)
+                if not cam_results["success"]:
+                    raise Exception(cam_results["error"])
+            
+            explain_data = {
+                "filename": filename,
+                "explain_mode": mode,
+                "explained_prediction": {
+                    "label": pred_results["top_label"],
+                    "probability": pred_results["top_probability"],
+                    "class_index": pred_results["top_class_index"]
+                },
+                "image_info": {
+                    "original_size": cam_results["original_size"],
+                    "model_input_size": cam_results["model_input_size"]
+                }
+            }
+            
+            # Both overlays are rendered from the CAM computed above
+            small_size = preview_size(cam_results["original_size"])
+            preview_base64 = await asyncio.to_thread(_render_overlay_base64, cam_results, small_size)
+            yield _ndjson_event("preview", {"data": {**explain_data, "heatmap_image": preview_base64, "preview_size": small_size}})
+            
+            overlay_base64 = await asyncio.to_thread(_render_overlay_base64, cam_results, cam_results["original_size"])
+            yield _ndjson_event("overlay", {"data": {**explain_data, "heatmap_image": overlay_base64}})
+            
+        except (DeadlineExceeded, ClientDisconnected) as e:
+            logger.warning(f"Explain stream dropped: {e}")
+            status_code = 504 if isinstance(e, DeadlineExceeded) else 499
+            yield _ndjson_event("error", create_error_response(str(e), status_code))
+        except Exception as e:
+            logger.error(f"Unexpected error in explain stream: {e}")
+            yield _ndjson_event("error", create_error_response(f"Explanation failed: {str(e)}"))
+        finally:
+            logger.info("removing the image")
+            file_manager.cleanup_file(file_path)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="application/x-ndjson",
+        # Stop reverse proxies from buffering the stream
+        headers={"X-Accel-Buffering": "no"}
+    )
+
+
 # Startup event to initialize model
 @router.on_event("startup")
 async def startup_event():
@@ -0,0 +1,290 @@
+import asyncio
+import os
+import time
+from collections import deque
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Header a client can send to shorten its own deadline, in milliseconds
+DEADLINE_HEADER = "X-Request-Timeout-Ms"
+
+DEFAULT_WEIGHTS = {"predict": 4, "explain": 1}
+DEFAULT_DEADLINES = {"predict": 15.0, "explain": 60.0}
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a job's deadline passes before it gets to run."""
+
+
+class ClientDisconnected(Exception):
+    """Raised when the client went away before its job got to run."""
+
+
+class _Job:
+    """A unit of blocking work waiting in a lane."""
+
+    def __init__(self, fn, args, kwargs, deadline, request, future, batch_fn=None, item=None, stages=None):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.deadline = deadline
+        self.request = request
+        self.future = future
+        self.batch_fn = batch_fn
+        self.item = item
+        self.stages = stages
+
+
+class PriorityScheduler:
+    """
+    Run blocking model work in weighted priority lanes.
+
+    Each lane is a FIFO queue. When a worker slot frees up, the next lane is
+    picked with smooth weighted round-robin, so a burst in a low-weight lane
+    (e.g. explain) cannot starve a high-weight one (e.g. predict), and vice versa.
+    Before a job runs it is dropped if its deadline passed or its client
+    disconnected. Jobs run in a worker thread so the event loop stays responsive.
+    
+    Jobs submitted with ``run_batched`` that queue up behind each other in the
+    same lane are merged into a single call, up to the lane's batch size.
+    Jobs submitted with ``run_stages`` keep their worker slot from one stage to
+    the next, so later stages do not go to the back of the lane.
+    """
+
+    def __init__(self, weights=None, concurrency=1, default_deadlines=None, batch_sizes=None):
+        self.weights = dict(weights or DEFAULT_WEIGHTS)
+        self.concurrency = concurrency
+        self.default_deadlines = dict(default_deadlines or DEFAULT_DEADLINES)
+        self.batch_sizes = dict(batch_sizes or {})
+        self.lanes = {lane: deque() for lane in self.weights}
+        self._current = {lane: 0 for lane in self.weights}
+        self._running = 0
+
+    def deadline_for(self, lane, request=None):
+        """
+        Compute the absolute (monotonic) deadline for a new request.
+
+        The lane default is an upper bound; a client may only tighten it
+        through the ``X-Request-Timeout-Ms`` header.
+        """
+        budget = self.default_deadlines.get(lane)
+        if request is not None:
+            header = request.headers.get(DEADLINE_HEADER)
+            if header:
+                try:
+                    client_budget = float(header) / 1000
+                except ValueError:
+                    client_budget = None
+                if client_budget is not None and client_budget > 0:
+                    budget = client_budget if budget is None else min(budget, client_budget)
+        return None if budget is None else time.monotonic() + budget
+
+    def queued(self, lane=None):
+        """Return the number of queued jobs in one lane or across all lanes."""
+        if lane is not None:
+            return len(self.lanes[lane])
+        return sum(len(queue) for queue in self.lanes.values())
+
+    async def run(self, lane, fn, *args, deadline=None, request=None, **kwargs):
+        """
+        Queue ``fn(*args, **kwargs)`` in ``lane`` and wait for its result.
+
+        Args:
+            lane: Lane name (must be one of the configured weights)
+            fn: Blocking callable to run in a worker thread
+            deadline: Absolute ``time.monotonic()`` deadline, or None
+            request: Starlette request used to detect client disconnects
+
+        Raises:
+            DeadlineExceeded: If the deadline passed before the job started
+            ClientDisconnected: If the client disconnected before the job started
+        """
+        if lane not in self.lanes:
+            raise ValueError(f"Unknown scheduler lane: {lane}")
+
+        future = asyncio.get_running_loop().create_future()
+        self.lanes[lane].append(_Job(fn, args, kwargs, deadline, request, future))
+        self._dispatch()
+        try:
+            return await future
+        except asyncio.CancelledError:
+            # The handler was cancelled; make sure the job is skipped if still queued
+            future.cancel()
+            raise
+
+    async def run_batched(self, lane, batch_fn, item, deadline=None, request=None):
+        """
+        Queue ``item`` for ``batch_fn`` in ``lane`` and wait for its own result.
+
+        ``batch_fn`` receives a list of items and must return a list of results in
+        the same order; a result that is an Exception is raised for that item only.
+        Items are grouped only with queued jobs that share the same ``batch_fn``.
+
+        Raises:
+            DeadlineExceeded: If the deadline passed before the batch started
+            ClientDisconnected: If the client disconnected before the batch started
+        """
+        if lane not in self.lanes:
+            raise ValueError(f"Unknown scheduler lane: {lane}")
+
+        future = asyncio.get_running_loop().create_future()
+        self.lanes[lane].append(_Job(None, (), {}, deadline, request, future, batch_fn=batch_fn, item=item))
+        self._dispatch()
+        try:
+            return await future
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+
+    async def run_stages(self, lane, stages, deadline=None, request=None):
+        """
+        Queue a chain of blocking stages in ``lane`` as one job and wait for all results.
+
+        The first stage is called with no arguments, each later stage with the
+        previous stage's result. Deadline and disconnect are checked again before
+        every stage, without giving up the worker slot in between.
+
+        Returns:
+            list: The result of every stage, in order
+
+        Raises:
+            DeadlineExceeded: If the deadline passed before a stage started
+            ClientDisconnected: If the client disconnected before a stage started
+        """
+        if lane not in self.lanes:
+            raise ValueError(f"Unknown scheduler lane: {lane}")
+
+        future = asyncio.get_running_loop().create_future()
+        self.lanes[lane].append(_Job(None, (), {}, deadline, request, future, stages=list(stages)))
+        self._dispatch()
+        try:
+            return await future
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+
+    def _pick_lane(self):
+        """Pick the next non-empty lane using smooth weighted round-robin."""
+        ready = [lane for lane, queue in self.lanes.items() if queue]
+        if not ready:
+            return None
+        total = 0
+        for lane in ready:
+            self._current[lane] += self.weights[lane]
+            total += self.weights[lane]
+        best = max(ready, key=lambda lane: self._current[lane])
+        self._current[best] -= total
+        return best
+
+    def _dispatch(self):
+        """Start queued jobs while worker slots are free."""
+        while self._running < self.concurrency:
+            lane = self._pick_lane()
+            if lane is None:
+                return
+            job = self.lanes[lane].popleft()
+            if job.future.done():
+                continue
+            self._running += 1
+            if job.batch_fn is not None:
+                asyncio.ensure_future(self._execute_batch(lane, [job] + self._take_batch(lane, job.batch_fn)))
+            else:
+                asyncio.ensure_future(self._execute(lane, job))
+
+    def _take_batch(self, lane, batch_fn):
+        """Pop queued jobs sharing ``batch_fn`` from the head of the lane, up to its batch size."""
+        queue = self.lanes[lane]
+        batch = []
+        while queue and len(batch) + 1 < self.batch_sizes.get(lane, 1) and queue[0].batch_fn is batch_fn:
+            job = queue.popleft()
+            if not job.future.done():
+                batch.append(job)
+        return batch
+
+    async def _check_runnable(self, lane, job):
+        """Raise if the job's deadline passed or its client went away."""
+        if job.deadline is not None and time.monotonic() > job.deadline:
+            logger.info(f"Dropping {lane} job: deadline exceeded while queued")
+            raise DeadlineExceeded(f"{lane} request deadline exceeded")
+        if job.request is not None and await job.request.is_disconnected():
+            logger.info(f"Dropping {lane} job: client disconnected")
+            raise ClientDisconnected(f"{lane} client disconnected")
+
+    async def _execute_batch(self, lane, jobs):
+        try:
+            runnable = []
+            for job in jobs:
+                try:
+                    await self._check_runnable(lane, job)
+                    runnable.append(job)
+                except Exception as e:
+                    if not job.future.done():
+                        job.future.set_exception(e)
+            if not runnable:
+                return
+
+            try:
+                results = await asyncio.to_thread(runnable[0].batch_fn, [job.item for job in runnable])
+            except Exception as e:
+                results = [e] * len(runnable)
+
+            for job, result in zip(runnable, results):
+                if job.future.done():
+                    continue
+                if isinstance(result, Exception):
+                    job.future.set_exception(result)
+                else:
+                    job.future.set_result(result)
+        finally:
+            self._running -= 1
+            self._dispatch()
+
+    async def _execute(self, lane, job):
+        try:
+            await self._check_runnable(lane, job)
+            # Once started, the work itself cannot be interrupted
+            if job.stages is not None:
+                result = await self._run_stages(lane, job)
+            else:
+                result = await asyncio.to_thread(job.fn, *job.args, **job.kwargs)
+            if not job.future.done():
+                job.future.set_result(result)
+        except Exception as e:
+            if not job.future.done():
+                job.future.set_exception(e)
+        finally:
+            self._running -= 1
+            self._dispatch()
+
+
+    async def _run_stages(self, lane, job):
+        results = []
+        for i, stage in enumerate(job.stages):
+            if i:
+                await self._check_runnable(lane, job)
+            results.append(await asyncio.to_thread(stage, *results[-1:]))
+        return results
+
+
+def _weights_from_env():
+    return {
+        "predict": int(os.getenv("PREDICT_LANE_WEIGHT", DEFAULT_WEIGHTS["predict"])),
+        "explain": int(os.getenv("EXPLAIN_LANE_WEIGHT", DEFAULT_WEIGHTS["explain"])),
+    }
+
+
+def _deadlines_from_env():
+    return {
+        "predict": float(os.getenv("PREDICT_DEADLINE_SECONDS", DEFAULT_DEADLINES["predict"])),
+        "explain": float(os.getenv("EXPLAIN_DEADLINE_SECONDS", DEFAULT_DEADLINES["explain"])),
+    }
+
+
+# Global scheduler instance. Concurrency defaults to 1 because Grad-CAM registers
+# hooks on the shared model, so model work must not overlap.
+scheduler = PriorityScheduler(
+    weights=_weights_from_env(),
+    concurrency=int(os.getenv("SCHEDULER_CONCURRENCY", 1)),
+    default_deadlines=_deadlines_from_env(),
+)
@@ -0,0 +1,17 @@
+import os
+import uvicorn
+
+from serving_config import load_serving_config, set_thread_env
+
+if __name__ == "__main__":
+    config = load_serving_config()
+    # Exported before uvicorn imports the app so torch/BLAS/OpenCV size their pools from it
+    set_thread_env(config)
+
+    uvicorn.run(
+        "app:app",
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", 8003)),
+        workers=int(config["workers"]),
+        timeout_keep_alive=1800,
+    )
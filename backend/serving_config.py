@@ -0,0 +1,146 @@
+import json
+import os
+from pathlib import Path
+import logging
+
+logger = logging.getLogger(__name__)
+
+CONFIG_PATH = os.getenv("SERVING_CONFIG", "serving_config.json")
+
+# None means "leave the library default alone", which is how the server ran before autotuning
+DEFAULT_CONFIG = {
+    "torch_threads": None,
+    "interop_threads": None,
+    "opencv_threads": None,
+    "workers": 1,
+    "batch_size": 1,
+}
+
+# Native thread pools that would otherwise each size themselves to every core
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+
+def effective_cpu_count():
+    """
+    Return the number of CPUs this process may actually use.
+
+    Takes the minimum of the CPU affinity mask and the cgroup CPU quota
+    (v2 ``cpu.max`` or v1 ``cpu.cfs_quota_us``), so containers limited to
+    e.g. 2 CPUs on a 64 core host report 2.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    quota = cgroup_cpu_quota()
+    if quota is not None:
+        cpus = min(cpus, max(1, int(quota)))
+    return max(1, cpus)
+
+
+def cgroup_cpu_quota():
+    """Return the cgroup CPU quota in CPUs, or None if unlimited/unknown."""
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        quota, period = Path("/sys/fs/cgroup/cpu.max").read_text().split()
+        if quota != "max":
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+
+    try:
+        # cgroup v1: quota is -1 when unlimited
+        quota = int(Path("/sys/fs/cgroup/cpu/cpu.cfs_quota_us").read_text())
+        period = int(Path("/sys/fs/cgroup/cpu/cpu.cfs_period_us").read_text())
+        if quota > 0 and period > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def load_serving_config(path=None):
+    """
+    Load the serving config written by ``autotune.py``.
+
+    Args:
+        path: Config file path (defaults to $SERVING_CONFIG or serving_config.json)
+
+    Returns:
+        dict: Config merged over ``DEFAULT_CONFIG``; defaults if the file is missing
+    """
+    path = Path(path or CONFIG_PATH)
+    config = dict(DEFAULT_CONFIG)
+    if not path.exists():
+        return config
+
+    try:
+        loaded = json.loads(path.read_text())
+    except (OSError, ValueError) as e:
+        logger.error(f"Ignoring unreadable serving config {path}: {e}")
+        return config
+
+    config.update({key: loaded[key] for key in DEFAULT_CONFIG if key in loaded})
+    logger.info(f"Loaded serving config from {path}: {config}")
+    return config
+
+
+def set_thread_env(config):
+    """Export native thread pool sizes; only effective before torch/cv2 are imported."""
+    if config.get("torch_threads"):
+        for var in THREAD_ENV_VARS:
+            os.environ[var] = str(config["torch_threads"])
+
+
+def thread_env_mismatches(config):
+    """
+    Return the thread env vars that do not match ``torch_threads``.
+
+    By the time the app starts, torch/BLAS/OpenCV have sized their pools from
+    these variables, so a mismatch means the server was not launched through
+    ``serve.py`` (which exports them first).
+    """
+    if not config.get("torch_threads"):
+        return []
+    expected = str(config["torch_threads"])
+    return [var for var in THREAD_ENV_VARS if os.environ.get(var) != expected]
+
+
+def apply_serving_config(config):
+    """
+    Apply thread settings to torch and OpenCV in the running process.
+
+    Args:
+        config: Config dict from ``load_serving_config``
+
+    Returns:
+        dict: The same config
+    """
+    import torch
+    import cv2
+
+    mismatched = thread_env_mismatches(config)
+    if mismatched:
+        logger.warning(
+            f"{', '.join(mismatched)} do not match torch_threads={config['torch_threads']}; native thread "
+            f"pools were sized before the serving config was read. Start the server with `python serve.py`."
+        )
+
+    if config.get("torch_threads"):
+        torch.set_num_threads(int(config["torch_threads"]))
+    if config.get("interop_threads"):
+        try:
+            torch.set_num_interop_threads(int(config["interop_threads"]))
+        except RuntimeError as e:
+            # Can only be set once, before any inter-op parallel work has started
+            logger.warning(f"Could not set torch inter-op threads: {e}")
+    if config.get("opencv_threads") is not None:
+        cv2.setNumThreads(int(config["opencv_threads"]))
+
+    logger.info(
+        f"Serving config applied: torch_threads={torch.get_num_threads()} "
+        f"interop_threads={torch.get_num_interop_threads()} batch_size={config['batch_size']}"
+    )
+    return config
@@ -0,0 +1,272 @@
+import argparse
+import gc
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import logging
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_IMAGES = ["NORMAL2-IM-1442-0001.jpeg", "person100_bacteria_481.jpeg"]
+
+
+def trim_heap():
+    """
+    Return freed heap pages to the OS (glibc only).
+
+    Production processes never do this, so RSS read after a trim hides the
+    fragmentation creep that makes long-running containers grow. It is only
+    used for the informational ``trimmed_rss_mb``.
+    """
+    try:
+        import ctypes
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+def get_rss_mb():
+    """Return the resident set size of the current process in MB."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # Fallback for non-Linux hosts: peak RSS is the best we can get
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def count_open_fds():
+    """Return the number of open file descriptors, or -1 if unknown."""
+    for fd_dir in ("/proc/self/fd", "/dev/fd"):
+        try:
+            return len(os.listdir(fd_dir))
+        except OSError:
+            continue
+    return -1
+
+
+def count_module_hooks(model):
+    """Count forward/backward hooks registered on every submodule of the model."""
+    total = 0
+    for module in model.modules():
+        for attr in ("_forward_hooks", "_forward_pre_hooks", "_backward_hooks", "_backward_pre_hooks"):
+            total += len(getattr(module, attr, None) or {})
+    return total
+
+
+def count_upload_files(upload_dir):
+    """Return the number of leftover files in the uploads directory."""
+    try:
+        return sum(1 for p in upload_dir.iterdir() if p.is_file())
+    except OSError:
+        return -1
+
+
+def take_sample(step, model, upload_dir, top_n=5, snapshot_path=None, trimmed_rss=False):
+    """
+    Collect a single memory/resource sample.
+
+    RSS, fds, hooks and uploads are read before the tracemalloc snapshot is taken,
+    since a snapshot itself costs hundreds of MB of RSS with torch loaded. The
+    snapshot is dropped right away; pass ``snapshot_path`` to dump it to disk for
+    a later ``compare_to``.
+
+    ``rss_mb`` is the untrimmed RSS, as a production process would see it. With
+    ``trimmed_rss`` the heap is also trimmed afterwards and the result reported as
+    ``trimmed_rss_mb``; this lowers every later ``rss_mb`` too, so it is opt-in.
+
+    Args:
+        step: Number of requests sent so far
+        model: Loaded PyTorch model (to count hooks on)
+        upload_dir: Path of the upload directory
+        top_n: Number of tracemalloc top allocators to keep
+        snapshot_path: Optional file to dump the snapshot to
+        trimmed_rss: Also report RSS after ``malloc_trim`` (informational)
+
+    Returns:
+        dict: Sample with rss, traced memory, fds, hooks, uploads and top allocators
+    """
+    gc.collect()
+    traced_current, _ = tracemalloc.get_traced_memory()
+    sample = {
+        "step": step,
+        "rss_mb": get_rss_mb(),
+        "traced_mb": traced_current / (1024 * 1024),
+        "open_fds": count_open_fds(),
+        "module_hooks": count_module_hooks(model) if model is not None else 0,
+        "upload_files": count_upload_files(upload_dir),
+    }
+    if trimmed_rss:
+        trim_heap()
+        sample["trimmed_rss_mb"] = get_rss_mb()
+
+    snapshot = tracemalloc.take_snapshot()
+    sample["top_allocators"] = [str(stat) for stat in snapshot.statistics("lineno")[:top_n]]
+    if snapshot_path is not None:
+        snapshot.dump(snapshot_path)
+    del snapshot
+    gc.collect()
+    return sample
+
+
+def format_sample(sample):
+    """One-line summary of a sample for progress output."""
+    line = f"rss={sample['rss_mb']:.1f}MB"
+    if "trimmed_rss_mb" in sample:
+        line += f" (trimmed {sample['trimmed_rss_mb']:.1f}MB)"
+    return (
+        f"{line} traced={sample['traced_mb']:.1f}MB fds={sample['open_fds']} "
+        f"hooks={sample['module_hooks']} uploads={sample['upload_files']}"
+    )
+
+
+def check_growth(baseline, final, max_rss_growth_mb, max_traced_growth_mb, max_fd_growth, max_hook_growth, max_upload_files):
+    """
+    Compare the final sample against the post-warmup baseline.
+
+    Args:
+        baseline: Sample taken after warmup
+        final: Sample taken at the end of the run
+        max_*: Allowed growth for each metric
+
+    Returns:
+        list: Human readable failure messages (empty if within thresholds)
+    """
+    failures = []
+    checks = [
+        ("rss_mb", max_rss_growth_mb, "RSS grew by {:.1f} MB (limit {} MB)"),
+        ("traced_mb", max_traced_growth_mb, "Traced Python memory grew by {:.1f} MB (limit {} MB)"),
+        ("open_fds", max_fd_growth, "Open file descriptors grew by {} (limit {})"),
+        ("module_hooks", max_hook_growth, "Registered module hooks grew by {} (limit {})"),
+    ]
+    for key, limit, message in checks:
+        growth = final[key] - baseline[key]
+        if growth > limit:
+            failures.append(message.format(growth, limit))
+
+    if final["upload_files"] > max_upload_files:
+        failures.append(f"{final['upload_files']} files left in uploads/ (limit {max_upload_files})")
+
+    return failures
+
+
+def load_sample_images(paths):
+    """Read sample images as (filename, bytes, content_type) tuples."""
+    images = []
+    for path in paths:
+        with open(path, "rb") as f:
+            content_type = "image/png" if path.lower().endswith(".png") else "image/jpeg"
+            images.append((os.path.basename(path), f.read(), content_type))
+    return images
+
+
+def run_soak(args):
+    """Drive predict/explain requests through the app in-process and sample resources."""
+    from fastapi.testclient import TestClient
+
+    import routes
+    from app import app
+    from utils import file_manager
+
+    images = load_sample_images(args.images)
+
+    snapshot_dir = tempfile.TemporaryDirectory()
+    baseline_snapshot_path = os.path.join(snapshot_dir.name, "baseline.snapshot")
+    final_snapshot_path = os.path.join(snapshot_dir.name, "final.snapshot")
+
+    tracemalloc.start(args.trace_frames)
+    baseline = None
+    errors = 0
+    started = time.perf_counter()
+
+    with TestClient(app) as client:
+        for step in range(1, args.requests + 1):
+            filename, data, content_type = images[step % len(images)]
+            explain = args.explain_every > 0 and step % args.explain_every == 0
+            endpoint = "/api/explain" if explain else "/api/predict"
+            response = client.post(endpoint, files={"file": (filename, io.BytesIO(data), content_type)})
+            if response.status_code != 200:
+                errors += 1
+
+            if step == args.warmup:
+                baseline = take_sample(step, routes.model, file_manager.upload_dir, snapshot_path=baseline_snapshot_path, trimmed_rss=args.trimmed_rss)
+            elif step > args.warmup and step % args.sample_every == 0:
+                sample = take_sample(step, routes.model, file_manager.upload_dir, trimmed_rss=args.trimmed_rss)
+                print(f"[{step:>6}] {format_sample(sample)} errors={errors}")
+
+        final = take_sample(args.requests, routes.model, file_manager.upload_dir, snapshot_path=final_snapshot_path, trimmed_rss=args.trimmed_rss)
+
+    tracemalloc.stop()
+    elapsed = time.perf_counter() - started
+
+    print(f"\nSent {args.requests} requests in {elapsed:.1f}s ({errors} errors)")
+    print(f"Baseline: {format_sample(baseline)}")
+    print(f"Final:    {format_sample(final)}")
+    print("\nTop allocators at end of run:")
+    for line in final["top_allocators"]:
+        print(f"  {line}")
+    print("\nTop allocation growth since warmup:")
+    # Snapshots are only loaded back once all measurements are done
+    final_snapshot = tracemalloc.Snapshot.load(final_snapshot_path)
+    baseline_snapshot = tracemalloc.Snapshot.load(baseline_snapshot_path)
+    for stat in final_snapshot.compare_to(baseline_snapshot, "lineno")[:args.top]:
+        print(f"  {stat}")
+    del final_snapshot, baseline_snapshot
+    snapshot_dir.cleanup()
+
+    failures = check_growth(
+        baseline,
+        final,
+        max_rss_growth_mb=args.max_rss_growth_mb,
+        max_traced_growth_mb=args.max_traced_growth_mb,
+        max_fd_growth=args.max_fd_growth,
+        max_hook_growth=args.max_hook_growth,
+        max_upload_files=args.max_upload_files,
+    )
+    if errors > args.max_errors:
+        failures.append(f"{errors} requests failed (limit {args.max_errors})")
+
+    if failures:
+        print("\nSOAK FAILED:")
+        for failure in failures:
+            print(f"  - {failure}")
+        return 1
+
+    print("\nSOAK PASSED")
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Soak test predict/explain for memory and resource leaks.")
+    parser.add_argument("--requests", type=int, default=2000, help="Total number of requests to send")
+    parser.add_argument("--warmup", type=int, default=50, help="Requests to send before taking the baseline sample")
+    parser.add_argument("--sample-every", type=int, default=100, help="Take a sample every N requests")
+    parser.add_argument("--explain-every", type=int, default=4, help="Send an explain request every N requests (0 = predict only)")
+    parser.add_argument("--images", nargs="+", default=SAMPLE_IMAGES, help="Images to cycle through")
+    parser.add_argument("--trace-frames", type=int, default=10, help="Stack depth recorded by tracemalloc")
+    parser.add_argument("--top", type=int, default=10, help="Number of top allocators to report")
+    parser.add_argument("--max-rss-growth-mb", type=float, default=150.0)
+    parser.add_argument("--max-traced-growth-mb", type=float, default=20.0)
+    parser.add_argument("--max-fd-growth", type=int, default=10)
+    parser.add_argument("--max-hook-growth", type=int, default=0)
+    parser.add_argument("--max-upload-files", type=int, default=0)
+    parser.add_argument("--max-errors", type=int, default=0)
+    parser.add_argument("--trimmed-rss", action="store_true",
+                        help="Also report RSS after malloc_trim (informational; lowers the gated untrimmed RSS too)")
+    args = parser.parse_args(argv)
+    # The baseline is taken after the last warmup request, so there must be requests left to measure
+    if not 1 <= args.warmup < args.requests:
+        parser.error(f"--warmup must be at least 1 and below --requests (got {args.warmup} and {args.requests})")
+    return args
+
+
+if __name__ == "__main__":
+    sys.exit(run_soak(parse_args()))
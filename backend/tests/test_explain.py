@@ -71,3 +71,92 @@ def test_generate_heatmap_invalid_image():
     assert result["success"] is False
     assert result["heatmap_overlay"] is None
     assert "cannot identify image file" in result["error"].lower()
+
+
+
+def make_tiny_cam_net():
+    """Build a DenseNet-shaped toy model: features -> ReLU -> global pool -> classifier."""
+    import torch
+
+    class TinyCamNet(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.features = torch.nn.Conv2d(1, 4, kernel_size=3, stride=32, padding=1)
+            self.classifier = torch.nn.Linear(4, 3)
+
+        def forward(self, x):
+            out = torch.relu(self.features(x))
+            out = torch.nn.functional.adaptive_avg_pool2d(out, (1, 1)).flatten(1)
+            return self.classifier(out)
+
+    torch.manual_seed(0)
+    return TinyCamNet().eval()
+
+
+def test_compute_fast_cams_single_forward():
+    """Fast CAM returns one [0, 1] map per class and the same probabilities as predict."""
+    import torch
+    from models.explain import compute_fast_cams
+
+    model = make_tiny_cam_net()
+    tensor_img = torch.randn(1, 1, 224, 224)
+
+    cams, probs = compute_fast_cams(model, tensor_img)
+
+    assert cams.shape == (3, 224, 224)
+    assert cams.min() >= 0 and cams.max() <= 1 + 1e-6
+    expected = torch.sigmoid(model(tensor_img)).detach().numpy()[0]
+    assert np.allclose(probs, expected, atol=1e-6)
+    # The hook used to capture feature maps must not stay registered
+    assert len(model.features._forward_hooks) == 0
+
+
+def test_compute_fast_cams_selected_classes():
+    """Only the requested classes are mapped."""
+    import torch
+    from models.explain import compute_fast_cams
+
+    cams, _ = compute_fast_cams(make_tiny_cam_net(), torch.randn(1, 1, 224, 224), class_indices=[2])
+    assert cams.shape == (1, 224, 224)
+
+
+def test_cam_similarity_identical_and_inverted():
+    """Identical maps agree perfectly; inverted maps do not."""
+    from cam_fidelity import cam_similarity
+
+    cam = np.linspace(0, 1, 224 * 224).reshape(224, 224)
+
+    same = cam_similarity(cam, cam)
+    assert same["pearson"] == pytest.approx(1.0)
+    assert same["top_iou"] == 1.0
+    assert same["mean_abs_diff"] == 0.0
+
+    inverted = cam_similarity(cam, 1 - cam)
+    assert inverted["pearson"] == pytest.approx(-1.0)
+    assert inverted["top_iou"] == 0.0
+
+
+def test_preview_size_keeps_aspect_ratio():
+    """Preview overlays are capped on the longest side and never upscaled."""
+    from models.explain import preview_size
+
+    assert preview_size((2048, 1024), max_side=256) == (256, 128)
+    assert preview_size((1000, 3000), max_side=300) == (100, 300)
+    assert preview_size((100, 80), max_side=256) == (100, 80)
+
+
+def test_compute_heatmap_cam_fast_picks_top_class(dummy_image_bytes):
+    """Fast mode returns probabilities and the top class from a single forward pass."""
+    from models.explain import compute_heatmap_cam
+
+    model = make_tiny_cam_net()
+    forward_calls = []
+    model.register_forward_hook(lambda m, i, o: forward_calls.append(1))
+
+    result = compute_heatmap_cam(dummy_image_bytes, model, target_layer=None, device="cpu", mode="fast")
+
+    assert result["success"] is True
+    assert len(forward_calls) == 1
+    assert result["class_index"] == int(np.argsort(result["probabilities"])[::-1][0])
+    assert result["cam"].shape == (224, 224)
+    assert result["original_size"] == (100, 100)
@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+from parity import probs_from_predictions, compare_to_reference, label_aurocs, check_gate, client_reduce
+
+
+LABELS = ["disease_A", "disease_B", "disease_C"]
+
+
+def test_probs_from_predictions_restores_label_order():
+    """Sorted predict() output maps back to a vector in label order."""
+    predictions = [{"label": "disease_C", "prob": 0.9}, {"label": "disease_A", "prob": 0.5}, {"label": "disease_B", "prob": 0.1}]
+    assert probs_from_predictions(predictions, LABELS).tolist() == [0.5, 0.1, 0.9]
+
+
+def test_compare_to_reference_identical():
+    ref = np.array([[0.9, 0.2, 0.1], [0.1, 0.3, 0.8]])
+    report = compare_to_reference(ref, ref.copy(), top_k=2)
+
+    assert report["max_delta"] == 0.0
+    assert report["top1_agreement"] == 1.0
+    assert report["topk_agreement"] == 1.0
+
+
+def test_compare_to_reference_detects_drift():
+    """A swapped top class shows up in the deltas and agreement scores."""
+    ref = np.array([[0.9, 0.2, 0.1], [0.1, 0.3, 0.8]])
+    probs = np.array([[0.9, 0.2, 0.1], [0.1, 0.85, 0.8]])
+    report = compare_to_reference(ref, probs, top_k=1)
+
+    assert report["max_delta"] == pytest.approx(0.55)
+    assert report["per_label_max_delta"].tolist() == pytest.approx([0.0, 0.55, 0.0])
+    assert report["top1_agreement"] == 0.5
+    assert report["topk_agreement"] == 0.5
+
+
+def test_label_aurocs_skips_unknown_and_single_class():
+    probs = np.array([[0.9, 0.2, 0.1], [0.1, 0.3, 0.8], [0.8, 0.4, 0.5]])
+    targets = {
+        "disease_A": [1, 0, None],
+        "disease_B": [0, 0, 0],
+        "not_a_model_label": [1, 0, 1],
+    }
+    aurocs = label_aurocs(probs, targets, LABELS)
+
+    assert aurocs == {"disease_A": 1.0, "disease_B": None}
+
+
+def test_check_gate():
+    report = {"max_delta": 0.03, "topk_agreement": 0.9, "aurocs": {"disease_A": 0.80}}
+    ref_aurocs = {"disease_A": 0.85}
+
+    assert check_gate(report, ref_aurocs, tolerance=0.05, min_topk_agreement=0.9, max_auroc_drop=0.1) == []
+
+    failures = check_gate(report, ref_aurocs, tolerance=0.01, min_topk_agreement=1.0, max_auroc_drop=0.01)
+    assert len(failures) == 3
+
+
+
+def test_run_paths_only_skips_unavailable_factories(monkeypatch):
+    """A factory raising PathUnavailable is skipped; crashes at build or run time are failures."""
+    import parity
+
+    def unavailable(*args):
+        raise parity.PathUnavailable("no engine")
+
+    def broken_factory(*args):
+        raise RuntimeError("Didn't find engine for operation quantized::linear_prepack")
+
+    def broken_run(*args):
+        def run(images):
+            raise RuntimeError("shape mismatch")
+        return run
+
+    def ok(*args):
+        return lambda images: np.ones((len(images), 2))
+
+    monkeypatch.setattr(parity, "PATHS", {"compiled": unavailable, "quantized": broken_run, "batched": broken_factory, "reduced": ok})
+
+    timings, crashed = parity.run_paths(["compiled", "quantized", "batched", "reduced"], (), [b"x"], repeats=1)
+
+    assert list(timings) == ["reduced"]
+    assert [name for name, _ in crashed] == ["quantized", "batched"]
+
+
+def test_quantized_path_unavailable_without_engine(monkeypatch):
+    import types
+    import torch
+    import parity
+
+    monkeypatch.setattr(torch.backends, "quantized", types.SimpleNamespace(engine="none", supported_engines=["none"]))
+    with pytest.raises(parity.PathUnavailable):
+        parity.quantized_path(torch.nn.Linear(2, 2), [], None, None, "cpu", 1)
+
+
+def test_client_reduce_matches_browser_luma():
+    """Integer luma with round-half-up, like Math.round in reduceImage."""
+    from PIL import Image
+
+    pixels = client_reduce(Image.new("RGB", (500, 300), (0, 0, 250)))
+
+    assert pixels.shape == (224, 224) and pixels.dtype == np.uint8
+    # 250 * 114 / 1000 = 28.5; numpy's round-half-even would give 28
+    assert (pixels == 29).all()
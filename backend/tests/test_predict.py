@@ -4,7 +4,7 @@ import torch
 import numpy as np
 from PIL import Image, UnidentifiedImageError
 from unittest.mock import MagicMock
-from models.inference import predict
+from models.inference import predict, predict_array, predict_batch
 
 
 @pytest.fixture
@@ -62,3 +62,47 @@ def test_predict_invalid_image():
             target_layer=None,
             device="cpu"
         )
+
+
+def test_predict_array_skips_decode():
+    """Test predict_array runs a reduced 224x224 buffer straight through the model."""
+    labels = ["disease_A", "disease_B", "disease_C"]
+    pixels = np.arange(224 * 224, dtype=np.uint32).astype(np.uint8).reshape(224, 224)
+
+    mock_model = MagicMock()
+    mock_model.return_value = torch.tensor([[1.5, -2.0, 0.3]])
+
+    result = predict_array(
+        pixels=pixels,
+        original_size=(2048, 2500),
+        model=mock_model,
+        labels=labels,
+        device="cpu"
+    )
+
+    model_input = mock_model.call_args[0][0]
+    assert model_input.shape == (1, 1, 224, 224)
+    assert float(model_input.min()) == -1024 and float(model_input.max()) == 1024
+    assert result["top_label"] == "disease_A"
+    assert result["original_size"] == (2048, 2500)
+
+
+def test_predict_batch_returns_one_result_per_input():
+    """Test predict_batch runs stacked inputs in one forward pass and keeps order."""
+    labels = ["disease_A", "disease_B", "disease_C"]
+
+    mock_model = MagicMock()
+    mock_model.return_value = torch.tensor([[2.0, 0.0, -1.0], [-1.0, 0.0, 3.0]])
+
+    results = predict_batch(
+        tensors=[torch.zeros((1, 1, 224, 224)), torch.ones((1, 1, 224, 224))],
+        original_sizes=[(100, 200), (300, 400)],
+        model=mock_model,
+        labels=labels,
+        device="cpu"
+    )
+
+    assert mock_model.call_count == 1
+    assert mock_model.call_args[0][0].shape == (2, 1, 224, 224)
+    assert [r["top_label"] for r in results] == ["disease_A", "disease_C"]
+    assert [r["original_size"] for r in results] == [(100, 200), (300, 400)]
@@ -0,0 +1,144 @@
+import asyncio
+import time
+import threading
+import pytest
+from scheduler import PriorityScheduler, DeadlineExceeded, ClientDisconnected, DEADLINE_HEADER
+
+
+class FakeRequest:
+    """Minimal stand-in for a Starlette request."""
+
+    def __init__(self, disconnected=False, headers=None):
+        self.disconnected = disconnected
+        self.headers = headers or {}
+
+    async def is_disconnected(self):
+        return self.disconnected
+
+
+def test_weighted_lanes_favor_predict_without_starving_explain():
+    """With weights 3:1 predicts mostly go first but explains still get slots."""
+    order = []
+    gate = threading.Event()
+
+    async def main():
+        scheduler = PriorityScheduler(weights={"predict": 3, "explain": 1}, concurrency=1)
+        # Occupy the only slot so everything else queues up
+        blocker = asyncio.ensure_future(scheduler.run("explain", gate.wait))
+        await asyncio.sleep(0)
+        jobs = [scheduler.run("explain", order.append, f"e{i}") for i in range(4)]
+        jobs += [scheduler.run("predict", order.append, f"p{i}") for i in range(4)]
+        pending = asyncio.gather(*jobs)
+        await asyncio.sleep(0)
+        gate.set()
+        await blocker
+        await pending
+
+    asyncio.run(main())
+
+    assert order == ["p0", "p1", "e0", "p2", "p3", "e1", "e2", "e3"]
+
+
+def test_expired_deadline_skips_work():
+    """Jobs whose deadline already passed are dropped before running."""
+    called = []
+
+    async def main():
+        scheduler = PriorityScheduler()
+        await scheduler.run("explain", called.append, 1, deadline=time.monotonic() - 1)
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(main())
+    assert called == []
+
+
+def test_disconnected_client_skips_work():
+    """Jobs whose client went away are dropped before running."""
+    called = []
+
+    async def main():
+        scheduler = PriorityScheduler()
+        await scheduler.run("explain", called.append, 1, request=FakeRequest(disconnected=True))
+
+    with pytest.raises(ClientDisconnected):
+        asyncio.run(main())
+    assert called == []
+
+
+def test_deadline_header_can_only_tighten():
+    """The client header shortens the lane deadline but never extends it."""
+    scheduler = PriorityScheduler(default_deadlines={"predict": 10.0, "explain": 60.0})
+    now = time.monotonic()
+
+    short = scheduler.deadline_for("predict", FakeRequest(headers={DEADLINE_HEADER: "500"}))
+    long = scheduler.deadline_for("predict", FakeRequest(headers={DEADLINE_HEADER: "999999"}))
+    bad = scheduler.deadline_for("predict", FakeRequest(headers={DEADLINE_HEADER: "soon"}))
+
+    assert short - now == pytest.approx(0.5, abs=0.1)
+    assert long - now == pytest.approx(10.0, abs=0.1)
+    assert bad - now == pytest.approx(10.0, abs=0.1)
+
+
+def test_batched_jobs_share_one_call():
+    """Queued run_batched jobs in a lane are merged up to its batch size."""
+    calls = []
+    gate = threading.Event()
+
+    def square_all(items):
+        calls.append(list(items))
+        return [ValueError("bad item") if item < 0 else item * item for item in items]
+
+    async def main():
+        scheduler = PriorityScheduler(concurrency=1, batch_sizes={"predict": 3})
+        blocker = asyncio.ensure_future(scheduler.run("explain", gate.wait))
+        await asyncio.sleep(0)
+        pending = asyncio.gather(
+            *[scheduler.run_batched("predict", square_all, item) for item in (1, 2, -1, 4)],
+            return_exceptions=True,
+        )
+        await asyncio.sleep(0)
+        gate.set()
+        await blocker
+        return await pending
+
+    results = asyncio.run(main())
+
+    assert calls == [[1, 2, -1], [4]]
+    assert results[:2] == [1, 4] and results[3] == 16
+    assert isinstance(results[2], ValueError)
+
+
+def test_staged_jobs_do_not_requeue_later_stages():
+    """A burst of two-stage jobs finishes each job before starting the next one."""
+    order = []
+
+    async def main():
+        scheduler = PriorityScheduler(concurrency=1)
+        jobs = [
+            scheduler.run_stages("explain", [lambda i=i: order.append(f"pred{i}") or i, lambda i: order.append(f"cam{i}") or i])
+            for i in range(4)
+        ]
+        return await asyncio.gather(*jobs)
+
+    results = asyncio.run(main())
+
+    assert order == ["pred0", "cam0", "pred1", "cam1", "pred2", "cam2", "pred3", "cam3"]
+    assert results[2] == [2, 2]
+
+
+def test_staged_job_rechecks_disconnect_between_stages():
+    """A client that goes away during the first stage skips the rest."""
+    request = FakeRequest()
+    called = []
+
+    def first():
+        called.append("first")
+        request.disconnected = True
+
+    async def main():
+        scheduler = PriorityScheduler()
+        await scheduler.run_stages("explain", [first, lambda _: called.append("second")], request=request)
+
+    with pytest.raises(ClientDisconnected):
+        asyncio.run(main())
+    assert called == ["first"]
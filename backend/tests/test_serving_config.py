@@ -0,0 +1,77 @@
+import json
+import os
+from serving_config import load_serving_config, effective_cpu_count, thread_env_mismatches, set_thread_env, DEFAULT_CONFIG, THREAD_ENV_VARS
+from autotune import candidate_pairs, estimated_runs, pick_best, rank_results
+
+
+def test_load_serving_config_missing_file(tmp_path):
+    """A missing config keeps the library defaults."""
+    assert load_serving_config(tmp_path / "missing.json") == DEFAULT_CONFIG
+
+
+def test_load_serving_config_merges_known_keys(tmp_path):
+    """Known keys override defaults; benchmark metadata is ignored."""
+    path = tmp_path / "serving_config.json"
+    path.write_text(json.dumps({"torch_threads": 2, "batch_size": 4, "benchmark": {"p99_ms": 12.0}}))
+
+    config = load_serving_config(path)
+
+    assert config["torch_threads"] == 2
+    assert config["batch_size"] == 4
+    assert config["workers"] == 1
+    assert "benchmark" not in config
+
+
+def test_thread_env_mismatches(monkeypatch):
+    """Thread env vars left at the library default are reported until serve.py exports them."""
+    # A private copy, so set_thread_env cannot leak into the rest of the session
+    environ = {k: v for k, v in os.environ.items() if k not in THREAD_ENV_VARS}
+    monkeypatch.setattr(os, "environ", environ)
+    config = dict(DEFAULT_CONFIG, torch_threads=2)
+
+    assert thread_env_mismatches(DEFAULT_CONFIG) == []
+    assert thread_env_mismatches(config) == list(THREAD_ENV_VARS)
+
+    set_thread_env(config)
+    assert thread_env_mismatches(config) == []
+
+
+def test_effective_cpu_count_is_positive():
+    assert effective_cpu_count() >= 1
+
+
+def test_candidate_pairs_never_oversubscribe():
+    """threads x workers never exceeds the CPU budget."""
+    pairs = candidate_pairs(6)
+
+    assert (6, 1) in pairs and (2, 3) in pairs and (1, 4) in pairs
+    assert (1, 5) not in pairs
+    assert all(threads * workers <= 6 for threads, workers in pairs)
+    assert (1, 6) in candidate_pairs(6, max_workers=0)
+
+
+def test_estimated_runs_stays_small_on_big_hosts():
+    """Batch sizes are only tried for the top pairs, so the grid no longer explodes."""
+    assert len(candidate_pairs(64)) == 23
+    assert estimated_runs(64, batch_sizes=[1, 2, 4, 8]) == 23 + 3 * 3
+
+
+def test_rank_results_puts_over_budget_last():
+    results = [
+        {"throughput": 50.0, "p99_ms": 400.0},
+        {"throughput": 30.0, "p99_ms": 90.0},
+        {"throughput": 20.0, "p99_ms": 60.0},
+    ]
+    ranked = rank_results(results, max_p99_ms=100)
+    assert [r["throughput"] for r in ranked] == [30.0, 20.0, 50.0]
+
+
+def test_pick_best_respects_latency_budget():
+    results = [
+        {"throughput": 50.0, "p99_ms": 400.0},
+        {"throughput": 30.0, "p99_ms": 90.0},
+        {"throughput": 20.0, "p99_ms": 60.0},
+    ]
+    assert pick_best(results)["throughput"] == 50.0
+    assert pick_best(results, max_p99_ms=100)["throughput"] == 30.0
+    assert pick_best(results, max_p99_ms=10)["p99_ms"] == 60.0
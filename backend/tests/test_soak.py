@@ -0,0 +1,50 @@
+import pytest
+import torch
+from soak import check_growth, count_module_hooks, parse_args
+
+
+def make_sample(**overrides):
+    sample = {"rss_mb": 500.0, "traced_mb": 10.0, "open_fds": 20, "module_hooks": 0, "upload_files": 0}
+    sample.update(overrides)
+    return sample
+
+
+LIMITS = dict(max_rss_growth_mb=100, max_traced_growth_mb=5, max_fd_growth=5, max_hook_growth=0, max_upload_files=0)
+
+
+def test_check_growth_within_limits():
+    """No failures when every metric stays under its threshold."""
+    failures = check_growth(make_sample(), make_sample(rss_mb=550.0, open_fds=22), **LIMITS)
+    assert failures == []
+
+
+def test_check_growth_reports_leaks():
+    """Each metric past its threshold produces a failure message."""
+    final = make_sample(rss_mb=700.0, traced_mb=30.0, open_fds=40, module_hooks=4, upload_files=3)
+    failures = check_growth(make_sample(), final, **LIMITS)
+    assert len(failures) == 5
+    assert any("hooks" in f for f in failures)
+    assert any("uploads/" in f for f in failures)
+
+
+def test_count_module_hooks():
+    """Hooks are counted across submodules and drop back once removed."""
+    model = torch.nn.Sequential(torch.nn.Linear(2, 2), torch.nn.ReLU())
+    assert count_module_hooks(model) == 0
+
+    handles = [
+        model[0].register_forward_hook(lambda m, i, o: None),
+        model[1].register_full_backward_hook(lambda m, gi, go: None),
+    ]
+    assert count_module_hooks(model) == 2
+
+    for handle in handles:
+        handle.remove()
+    assert count_module_hooks(model) == 0
+
+
+@pytest.mark.parametrize("argv", [["--requests", "50", "--warmup", "50"], ["--requests", "50", "--warmup", "80"], ["--warmup", "0"]])
+def test_parse_args_rejects_warmup_without_measured_requests(argv):
+    """Without requests after warmup there is no baseline to compare against."""
+    with pytest.raises(SystemExit):
+        parse_args(argv)
@@ -6,8 +6,13 @@ from typing import Optional, Tuple
 from fastapi import UploadFile, HTTPException
 import base64
 from PIL import Image
+import numpy as np
 import io
 
+# Reduced uploads are raw 224x224 uint8 grayscale buffers, already resized client-side
+REDUCED_UPLOAD_SIZE = 224
+MAX_ORIGINAL_DIMENSION = 20000
+
 
 class FileManager:
     """Utility class for handling file uploads, storage, and cleanup."""
@@ -56,6 +61,40 @@ class FileManager:
                 file_path.unlink()
             raise HTTPException(status_code=400, detail=f"Failed to process image: {str(e)}")
     
+    def read_reduced_upload(self, file: UploadFile, width: Optional[int], height: Optional[int]) -> np.ndarray:
+        """
+        Read and validate a pre-reduced grayscale pixel buffer.
+        
+        Nothing is written to disk and no image decoding happens.
+        
+        Args:
+            file: FastAPI UploadFile holding 224*224 raw uint8 pixels (row-major)
+            width: Width of the original image before reduction
+            height: Height of the original image before reduction
+            
+        Returns:
+            uint8 numpy array of shape (224, 224)
+            
+        Raises:
+            HTTPException: If the buffer or the original dimensions are invalid
+        """
+        for name, value in (("width", width), ("height", height)):
+            if value is None or not 0 < value <= MAX_ORIGINAL_DIMENSION:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Invalid original {name}. Must be between 1 and {MAX_ORIGINAL_DIMENSION}"
+                )
+        
+        expected = REDUCED_UPLOAD_SIZE * REDUCED_UPLOAD_SIZE
+        pixel_bytes = file.file.read(expected + 1)
+        if len(pixel_bytes) != expected:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid pixel buffer. Expected {expected} bytes of {REDUCED_UPLOAD_SIZE}x{REDUCED_UPLOAD_SIZE} uint8 grayscale"
+            )
+        
+        return np.frombuffer(pixel_bytes, dtype=np.uint8).reshape(REDUCED_UPLOAD_SIZE, REDUCED_UPLOAD_SIZE)
+    
     def cleanup_file(self, file_path: str) -> bool:
         """
         Remove file from disk.
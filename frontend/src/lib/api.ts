@@ -1,12 +1,79 @@
 // api/predict.ts
+import type { PredictResponse, ExplainResponse } from "./model";
+
 const BASE_URL = 'http://0.0.0.0:8007'
 
-export const predictDiseaseAPI = async (file: File) => {
+// Optional per-request deadline; the server drops the job if it cannot start in time
+const deadlineHeaders = (timeoutMs?: number): HeadersInit =>
+    timeoutMs ? { "X-Request-Timeout-Ms": String(timeoutMs) } : {};
+
+// Normalize data
+const normalizePrediction = (data: any): PredictResponse => ({
+    ...data,
+    predictions: data.predictions.map((pred: any) => ({
+        label: pred.label,
+        probability: pred.prob,
+    })),
+    top_prediction: {
+        label: data.top_prediction.label,
+        probability: data.top_prediction.probability,
+    },
+});
+
+const MODEL_INPUT_SIZE = 224;
+
+// Downscale to the model's 224x224 grayscale input in the browser so we upload ~50KB
+// instead of the full image. Returns null when the browser can't decode/draw it.
+const reduceImage = async (file: File) => {
+    try {
+        // The server ignores EXIF orientation (PIL's Image.open size and pixels), so
+        // do the same here; otherwise rotated JPEGs get rotated pixels and swapped
+        // width/height compared with the full-upload path.
+        const bitmap = await createImageBitmap(file, { imageOrientation: "none" });
+        const canvas = document.createElement("canvas");
+        canvas.width = MODEL_INPUT_SIZE;
+        canvas.height = MODEL_INPUT_SIZE;
+        const ctx = canvas.getContext("2d");
+        if (!ctx) return null;
+
+        ctx.imageSmoothingEnabled = true;
+        ctx.imageSmoothingQuality = "high";
+        ctx.drawImage(bitmap, 0, 0, MODEL_INPUT_SIZE, MODEL_INPUT_SIZE);
+        const { data } = ctx.getImageData(0, 0, MODEL_INPUT_SIZE, MODEL_INPUT_SIZE);
+
+        // Not bit-identical to the server path: here RGB is resampled by the canvas and
+        // then converted to luma, while get_preprocess converts to L first and then
+        // resizes with LANCZOS. parity.py's "reduced" path (client_reduce) mirrors this order.
+        // Same luma weights as PIL's convert("L")
+        const pixels = new Uint8Array(MODEL_INPUT_SIZE * MODEL_INPUT_SIZE);
+        for (let i = 0; i < pixels.length; i++) {
+            const r = data[i * 4], g = data[i * 4 + 1], b = data[i * 4 + 2];
+            pixels[i] = Math.round((r * 299 + g * 587 + b * 114) / 1000);
+        }
+
+        const reduced = { pixels, width: bitmap.width, height: bitmap.height };
+        bitmap.close();
+        return reduced;
+    } catch (error) {
+        console.warn("client-side downscale unavailable, uploading full image:", error);
+        return null;
+    }
+};
+
+export const predictDiseaseAPI = async (file: File, timeoutMs?: number) => {
     const formData = new FormData();
-    formData.append("file", file);
+    const reduced = await reduceImage(file);
+    if (reduced) {
+        formData.append("pixels", new Blob([reduced.pixels], { type: "application/octet-stream" }), file.name);
+        formData.append("width", String(reduced.width));
+        formData.append("height", String(reduced.height));
+    } else {
+        formData.append("file", file);
+    }
 
     const response = await fetch(`${BASE_URL}/api/predict`, {
         method: "POST",
+        headers: deadlineHeaders(timeoutMs),
         body: formData,
     });
 
@@ -22,26 +89,16 @@ export const predictDiseaseAPI = async (file: File) => {
     }
     console.log("predict response:",result)
 
-    // Normalize data
-    return {
-        ...result.data,
-        predictions: result.data.predictions.map((pred: any) => ({
-            label: pred.label,
-            probability: pred.prob,
-        })),
-        top_prediction: {
-            label: result.data.top_prediction.label,
-            probability: result.data.top_prediction.probability,
-        },
-    };
+    return normalizePrediction(result.data);
 };
 
-export const explainPredictionAPI = async (file: File) => {
+export const explainPredictionAPI = async (file: File, timeoutMs?: number) => {
     const formData = new FormData();
     formData.append("file", file);
 
     const response = await fetch(`${BASE_URL}/api/explain`, {
         method: "POST",
+        headers: deadlineHeaders(timeoutMs),
         body: formData,
     });
 
@@ -57,4 +114,66 @@ export const explainPredictionAPI = async (file: File) => {
     console.log("explain response:", result)
 
     return result.data; // 🔥 only return the useful data
-  };
\ No newline at end of file
+  };
+
+export type ExplainStreamEvent =
+    | { type: "prediction"; data: PredictResponse }
+    | { type: "preview"; data: ExplainResponse }
+    | { type: "overlay"; data: ExplainResponse };
+
+// Streams /api/explain/stream (NDJSON): predictions arrive first, then a low-res
+// heatmap preview, then the full overlay. Resolves with the full overlay.
+export const explainPredictionStreamAPI = async (
+    file: File,
+    onEvent: (event: ExplainStreamEvent) => void,
+    timeoutMs?: number,
+): Promise<ExplainResponse> => {
+    const formData = new FormData();
+    formData.append("file", file);
+
+    const response = await fetch(`${BASE_URL}/api/explain/stream`, {
+        method: "POST",
+        headers: deadlineHeaders(timeoutMs),
+        body: formData,
+    });
+
+    if (!response.ok || !response.body) {
+        const errorData = await response.json().catch(() => ({}));
+        throw new Error(errorData.detail || errorData.message || "Explanation failed");
+    }
+
+    const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+    let buffer = "";
+    let overlay: ExplainResponse | null = null;
+
+    const handleLine = (line: string) => {
+        if (!line.trim()) return;
+        const event = JSON.parse(line);
+        if (event.type === "error") {
+            throw new Error(event.error || "Explanation failed");
+        }
+        if (event.type === "prediction") {
+            onEvent({ type: "prediction", data: normalizePrediction(event.data) });
+            return;
+        }
+        if (event.type === "overlay") {
+            overlay = event.data;
+        }
+        onEvent(event as ExplainStreamEvent);
+    };
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += value;
+        const lines = buffer.split("\n");
+        buffer = lines.pop() ?? "";
+        lines.forEach(handleLine);
+    }
+    handleLine(buffer);
+
+    if (!overlay) {
+        throw new Error("Explanation stream ended early");
+    }
+    return overlay;
+};
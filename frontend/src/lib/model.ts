@@ -17,6 +17,8 @@ export interface PredictResponse {
 export interface ExplainResponse {
     filename: string;
     heatmap_image: string;
+    explain_mode?: "gradcam" | "fast";
+    preview_size?: [number, number];
     explained_prediction: {
         label: string;
         probability: number;
@@ -1,7 +1,7 @@
 import type { PredictResponse, ExplainResponse } from "../../../lib/model";
 import { useState, type ChangeEvent } from "react";
 import { Upload, Activity, Eye, AlertCircle, CheckCircle, Loader2,} from "lucide-react";
-import { predictDiseaseAPI, explainPredictionAPI } from "../../../lib/api";
+import { predictDiseaseAPI, explainPredictionStreamAPI } from "../../../lib/api";
 
 
 export default function ImgUpload() {
@@ -51,7 +51,14 @@ export default function ImgUpload() {
         // const BASE_URL = 'http://0.0.0.0:8007'
 
         try {
-            const data = await explainPredictionAPI(file);
+            // Predictions and a low-res preview show up before the full overlay is ready
+            const data = await explainPredictionStreamAPI(file, (event) => {
+                if (event.type === "prediction") {
+                    setPredictions(event.data);
+                } else {
+                    setExplanation(event.data);
+                }
+            });
             setExplanation(data);
         } catch (error) {
             console.error("❌ Explanation error:", error);
@@ -223,7 +230,9 @@ export default function ImgUpload() {
                     </div>
 
                     <div className="mb-4">
-                        <h4 className="font-medium text-gray-900 mb-2">Grad-CAM Heatmap</h4>
+                        <h4 className="font-medium text-gray-900 mb-2">
+                            Grad-CAM Heatmap{explanation.preview_size && " (preview, refining...)"}
+                        </h4>
                         <p className="text-sm text-gray-600 mb-3">
                             Red areas show regions the AI focused on for the prediction: <strong>{explanation.explained_prediction.label}</strong>
                         </p>